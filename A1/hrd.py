@@ -1,9 +1,34 @@
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from queue import Empty
 from copy import deepcopy  
 from heapq import heappush, heappop  
+from array import array
 import time  
 import argparse  
+import asyncio
+import bisect
+import csv
+import glob
+import io
+import mmap
+import multiprocessing
+import os
+import signal
+import sqlite3
+import shutil
+import socketserver
+import stat
+import struct
 import sys  
+import tempfile
+import threading
+import tracemalloc
 import heapq  
+import json
+import random
 import time
   
   
@@ -11,13 +36,14 @@ import time
   
 char_goal = '1'  
 char_single = '2'  
+char_blank = '.'  
   
 class Piece:  
     """ 
     This represents a piece on the Hua Rong Dao puzzle. 
     """  
   
-    def __init__(self, is_goal, is_single, coord_x, coord_y, orientation):  
+    def __init__(self, is_goal, is_single, coord_x, coord_y, orientation, kind=None):  
         """ 
         :param is_goal: True if the piece is the goal piece and False otherwise. 
         :type is_goal: bool 
@@ -30,6 +56,9 @@ class Piece:
         :param orientation: The orientation of the piece (one of 'h' or 'v')  
             if the piece is a 1x2 piece. Otherwise, this is None 
         :type orientation: str 
+        :param kind: The index of the piece in a Geometry's catalog, or None 
+            to work it out from the other flags on the standard board. 
+        :type kind: Optional[int] 
         """  
   
         self.is_goal = is_goal  
@@ -37,6 +66,7 @@ class Piece:
         self.coord_x = coord_x  
         self.coord_y = coord_y  
         self.orientation = orientation  
+        self.kind = kind  
   
     def __repr__(self):  
         return '{} {} {} {} {}'.format(self.is_goal, self.is_single, self.coord_x, self.coord_y, self.orientation)  
@@ -59,14 +89,17 @@ class Board:
     Board class for setting up the playing board. 
     """  
   
-    def __init__(self, pieces):  
+    def __init__(self, pieces, geometry=None):  
         """ 
         :param pieces: The list of Pieces 
         :type pieces: List[Piece] 
+        :param geometry: The board size and piece catalog; the standard 4x5 board if None. 
+        :type geometry: Optional[Geometry] 
         """  
   
-        self.width = 4  
-        self.height = 5  
+        self.geometry = geometry or STANDARD  
+        self.width = self.geometry.width  
+        self.height = self.geometry.height  
   
         self.pieces = pieces  
   
@@ -90,20 +123,8 @@ class Board:
             self.grid.append(line)  
   
         for piece in self.pieces:  
-            if piece.is_goal:  
-                self.grid[piece.coord_y][piece.coord_x] = char_goal  
-                self.grid[piece.coord_y][piece.coord_x + 1] = char_goal  
-                self.grid[piece.coord_y + 1][piece.coord_x] = char_goal  
-                self.grid[piece.coord_y + 1][piece.coord_x + 1] = char_goal  
-            elif piece.is_single:  
-                self.grid[piece.coord_y][piece.coord_x] = char_single  
-            else:  
-                if piece.orientation == 'h':  
-                    self.grid[piece.coord_y][piece.coord_x] = '<'  
-                    self.grid[piece.coord_y][piece.coord_x + 1] = '>'  
-                elif piece.orientation == 'v':  
-                    self.grid[piece.coord_y][piece.coord_x] = '^'  
-                    self.grid[piece.coord_y + 1][piece.coord_x] = 'v'  
+            for (dx, dy), ch in self.geometry.glyphs[self.geometry.kind_of(piece)]:  
+                self.grid[piece.coord_y + dy][piece.coord_x + dx] = ch  
   
       
   
@@ -125,8 +146,8 @@ class Board:
         y_0 = -1   
         x_1 = -1  
         y_1 = -1   
-        for y in range(0,5):  
-            for x in range(0,4):  
+        for y in range(self.height):  
+            for x in range(self.width):  
                 if self.grid[y][x] == '.':  
                     if x_0 == -1:  
                         x_0 = x  
@@ -136,8 +157,8 @@ class Board:
                         y_1 = y  
           
   
-        for y in range(0,5):  
-            for x in range(0,4):  
+        for y in range(self.height):  
+            for x in range(self.width):  
                 if self.grid[y][x] == '.':  
                     if x_0 == x and y_0 == y:  
                         pass  
@@ -186,162 +207,87 @@ class State:
   
   
   
-def read_from_file(filename):  
+def read_from_file(filename, geometry=None):  
     """ 
     Load initial board from a given file. 
  
     :param filename: The name of the given file. 
     :type filename: str 
+    :param geometry: The board size and piece catalog; the standard 4x5 board if None. 
+    :type geometry: Optional[Geometry] 
     :return: A loaded board 
     :rtype: Board 
     """  
   
     puzzle_file = open(filename, "r")  
+    lines = [line.rstrip("\n") for line in puzzle_file]  
+    puzzle_file.close()  
   
-    line_index = 0  
-    pieces = []  
-    g_found = False  
+    # editors often end the file with a blank line after the last row  
+    while lines and not lines[-1].strip():  
+        lines.pop()  
   
-    for line in puzzle_file:  
+    # reject malformed boards before building Pieces from them  
+    parse_bits(lines, geometry or STANDARD)  
+    return parse_board(lines, geometry)  
   
-        for x, ch in enumerate(line):  
+def parse_board(lines, geometry=None):  
+    """ 
+    Build a board from the rows of its text grid, as found in a puzzle file. 
+ 
+    :param lines: The rows of the grid, without line endings. 
+    :type lines: List[str] 
+    :param geometry: The board size and piece catalog; the standard 4x5 board if None. 
+    :type geometry: Optional[Geometry] 
+    :return: A loaded board 
+    :rtype: Board 
+    """  
   
-            if ch == '^': # found vertical piece  
-                pieces.append(Piece(False, False, x, line_index, 'v'))  
-            elif ch == '<': # found horizontal piece  
-                pieces.append(Piece(False, False, x, line_index, 'h'))  
-            elif ch == char_single:  
-                pieces.append(Piece(False, True, x, line_index, None))  
-            elif ch == char_goal:  
-                if g_found == False:  
-                    pieces.append(Piece(True, False, x, line_index, None))  
-                    g_found = True  
-        line_index += 1  
+    geometry = geometry or STANDARD  
+    pieces = []  
+    claimed = set()  
   
-    puzzle_file.close()  
+    for y, line in enumerate(lines):  
+        for x, ch in enumerate(line):  
+            if (x, y) in claimed:  
+                continue  
+            # a piece starts at its anchor, the first of its cells in reading order  
+            for kind, glyphs in enumerate(geometry.glyphs):  
+                cells = [(x + dx, y + dy, glyph) for (dx, dy), glyph in glyphs]  
+                if all(0 <= cy < len(lines) and 0 <= cx < len(lines[cy]) and lines[cy][cx] == glyph  
+                       and (cx, cy) not in claimed for cx, cy, glyph in cells):  
+                    pieces.append(geometry.piece(kind, x, y))  
+                    claimed.update((cx, cy) for cx, cy, glyph in cells)  
+                    break  
   
-    board = Board(pieces)  
+    board = Board(pieces, geometry)  
       
     return board  
   
-def write_file(filename, state9):  
+def write_file(filename, state9, format="grids", started=None):  
     """ 
     Write boards to a given file. 
  
     :param filename: The name of the given file. 
     :type filename: str 
-    :return: A loaded board 
-    :rtype: Board 
+    :param state9: The last state of the solution; its parents lead back to the start. 
+    :type state9: State 
+    :param format: "grids" for every board of the path, "moves" for the start 
+        board followed by one line per move. 
+    :type format: str 
+    :param started: The time.time() the search started, for the time printed. 
+    :type started: Optional[float] 
     """ 
-    count = 0 
+    geometry = state9.board.geometry  
     sol = []  
-    sol_file = open(filename, "w")  
     while state9 != None:  
-        sol.append(state9)  
+        sol.append(board_to_bits(state9.board, geometry))  
         state9 = state9.parent  
     sol.reverse()  
-    for state in sol:  
-        for i, line in enumerate(state.board.grid):  
-            for ch in line:  
-                sol_file.write(ch)  
-            sol_file.write("\n")  
-        sol_file.write("\n")
-        count+=1  
-    sol_file.close()
-    print(str(count-1) + " moves using " + str(time.time() - start_time)+ "s \n" )  
-  
-  
-def legal_move_check(i, board, direction):  
-    x0, y0, x1, y1 = board.find_empty()  
-    if board.pieces[i].is_goal: #piece is caocao  
-        if board.pieces[i].coord_y == 0 and direction == "up":    
-            return False    
-        elif board.pieces[i].coord_y == 3 and direction == "down":    
-            return False    
-        elif board.pieces[i].coord_x == 0 and direction == "left":    
-            return False    
-        elif board.pieces[i].coord_x == 2 and direction == "right":    
-            return False  
-        # above is check for border of the board  
-        if direction == "up":  
-            e = [(board.pieces[i].coord_x, board.pieces[i].coord_y-1), (board.pieces[i].coord_x+1, board.pieces[i].coord_y-1)]  
-            return (x0, y0) in e and (x1, y1) in e  
-        elif direction == "down":  
-            e = [(board.pieces[i].coord_x, board.pieces[i].coord_y+2), (board.pieces[i].coord_x+1, board.pieces[i].coord_y+2)]  
-            return (x0, y0) in e and (x1, y1) in e  
-        elif direction == "left":  
-            e = [(board.pieces[i].coord_x-1, board.pieces[i].coord_y), (board.pieces[i].coord_x-1, board.pieces[i].coord_y+1)]  
-            return (x0, y0) in e and (x1, y1) in e  
-        elif direction == "right":  
-            e = [(board.pieces[i].coord_x+2, board.pieces[i].coord_y), (board.pieces[i].coord_x+2, board.pieces[i].coord_y+1)]  
-            return (x0, y0) in e and (x1, y1) in e  
-    elif board.pieces[i].orientation == 'v': #piece is vertical  
-        if board.pieces[i].coord_y == 0 and direction == "up":    
-            return False    
-        elif board.pieces[i].coord_y == 3 and direction == "down":    
-            return False    
-        elif board.pieces[i].coord_x == 0 and direction == "left":    
-            return False    
-        elif board.pieces[i].coord_x == 3 and direction == "right":    
-            return False  
-        # above is check for border of the board  
-        if direction == "up":  
-            e = [(board.pieces[i].coord_x, board.pieces[i].coord_y-1)]  
-            return (x0, y0) in e or (x1, y1) in e  
-        elif direction == "down":  
-            e = [(board.pieces[i].coord_x, board.pieces[i].coord_y+2)]  
-            return (x0, y0) in e or (x1, y1) in e  
-        elif direction == "left":  
-            e = [(board.pieces[i].coord_x-1, board.pieces[i].coord_y), (board.pieces[i].coord_x-1, board.pieces[i].coord_y+1)]  
-            return (x0, y0) in e and (x1, y1) in e  
-        elif direction == "right":  
-            e = [(board.pieces[i].coord_x+1, board.pieces[i].coord_y), (board.pieces[i].coord_x+1, board.pieces[i].coord_y+1)]  
-            return (x0, y0) in e and (x1, y1) in e  
-    elif board.pieces[i].orientation == 'h': #piece is horizontal  
-        if board.pieces[i].coord_y == 0 and direction == "up":    
-            return False    
-        elif board.pieces[i].coord_y == 4 and direction == "down":    
-            return False    
-        elif board.pieces[i].coord_x == 0 and direction == "left":    
-            return False    
-        elif board.pieces[i].coord_x == 2 and direction == "right":    
-            return False  
-        # above is check for border of the board  
-        if direction == "up":  
-            e = [(board.pieces[i].coord_x, board.pieces[i].coord_y-1), (board.pieces[i].coord_x+1, board.pieces[i].coord_y-1)]  
-            return (x0, y0) in e and (x1, y1) in e  
-        elif direction == "down":  
-            e = [(board.pieces[i].coord_x, board.pieces[i].coord_y+1), (board.pieces[i].coord_x+1, board.pieces[i].coord_y+1)]  
-            return (x0, y0) in e and (x1, y1) in e  
-        elif direction == "left":  
-            e = [(board.pieces[i].coord_x-1, board.pieces[i].coord_y)]  
-            return (x0, y0) in e or (x1, y1) in e  
-        elif direction == "right":  
-            e = [(board.pieces[i].coord_x+2, board.pieces[i].coord_y)]  
-            return (x0, y0) in e or (x1, y1) in e  
-    elif board.pieces[i].is_single: # piece is a soldier  
-        if board.pieces[i].coord_y == 0 and direction == "up":    
-            return False    
-        elif board.pieces[i].coord_y == 4 and direction == "down":    
-            return False    
-        elif board.pieces[i].coord_x == 0 and direction == "left":    
-            return False    
-        elif board.pieces[i].coord_x == 3 and direction == "right":    
-            return False  
-        # above is check for border of the board  
-        if direction == "up":  
-            e = [ (board.pieces[i].coord_x, board.pieces[i].coord_y-1)]  
-            return (x0, y0) in e or (x1, y1) in e  
-        elif direction == "down":  
-            e = [(board.pieces[i].coord_x, board.pieces[i].coord_y+1)]  
-            return (x0, y0) in e or (x1, y1) in e  
-        elif direction == "left":  
-            e = [(board.pieces[i].coord_x-1, board.pieces[i].coord_y)]  
-            return (x0, y0) in e or (x1, y1) in e  
-        elif direction == "right":  
-            e = [(board.pieces[i].coord_x+1, board.pieces[i].coord_y)]  
-            return (x0, y0) in e or (x1, y1) in e  
-  
+    write_path(filename, sol, geometry, format)  
+    if started is None:  
+        started = time.time()  
+    print(str(len(sol)-1) + " moves using " + str(time.time() - started)+ "s \n" )  
   
   
 def display_sol(state9):  
@@ -351,27 +297,39 @@ def display_sol(state9):
         print("\n")  
         state9 = state9.parent  
   
-def dfs(state0, filename="sol.txt"):  
+def dfs(state0, filename="sol.txt", format="grids", stats=None):  
+    if stats is None:  
+        stats = SearchStats()  
+    started = time.time()  
+    search_started = time.perf_counter()  
     frontier = [state0]  
     visited = set()
-    visited.add(grid_hashing(state0.board.grid))  
+    visited.add(board_to_bits(state0.board, state0.board.geometry))  
     rslt = []  
-    found = False  
+    found = None  
     while frontier != []:  
         if found:  
             break  
         state0 = frontier.pop()  
-        rslt = neighbouring(visited, copy(state0))  
+        stats.expanded += 1  
+        if stats.expanded & 0xff == 0:  
+            stats.check()  
+        rslt = neighbouring(visited, copy(state0), stats)  
         for state in rslt:  
             if is_goal(state):  
-                found = True  
-                print("found")  
-                #display_sol(state)  
-                write_file(filename, state)  
+                found = state  
                 break;  
             
             frontier.append(state)  
-                  
+        stats.peak_frontier = max(stats.peak_frontier, len(frontier))  
+    stats.visited = len(visited)  
+    stats.add_phase("search", time.perf_counter() - search_started)  
+    if found:  
+        print("found")  
+        #display_sol(state)  
+        with stats.phase("write"):  
+            write_file(filename, found, format, started)  
+    return found  
   
     # if not found:  
     #     print("not found")  
@@ -382,37 +340,49 @@ def dfs(state0, filename="sol.txt"):
 def manhattan(board):  
     for piece in board.pieces:  
         if piece.is_goal:  
-            return abs(1 - piece.coord_x) + abs(3 - piece.coord_y)  
+            return board.geometry.goal_distance[piece.coord_y * board.width + piece.coord_x]  
           
   
-def astar(state0, filename="sol.txt"):  
+def astar(state0, filename="sol.txt", format="grids", stats=None):  
+    if stats is None:  
+        stats = SearchStats()  
+    started = time.time()  
+    search_started = time.perf_counter()  
     frontier = []  
     heapq.heapify(frontier)  
     heapq.heappush(frontier, state0)  
     visited = set()
-    visited.add(grid_hashing(state0.board.grid)) 
+    visited.add(board_to_bits(state0.board, state0.board.geometry)) 
     rslt = []  
-    found = False  
+    found = None  
     temp = heapq.heappop(frontier)  
     while temp is not None:  
         if found:  
             break  
-        rslt = neighbouring(visited, copy(temp))  
+        stats.expanded += 1  
+        if stats.expanded & 0xff == 0:  
+            stats.check()  
+        rslt = neighbouring(visited, copy(temp), stats)  
         for state in rslt:  
             #add heuristic value to f  
             state.f = state.depth + manhattan(state.board)  
             if is_goal(state):  
-                found = True  
-                print("found")  
-                #display_sol(state)  
-                write_file(filename, state)  
+                found = state  
                 break;  
-            #new_hash = grid_hashing(state.board.grid)
               
             heapq.heappush(frontier, state)  
             #visited.add(new_hash) 
+        stats.peak_frontier = max(stats.peak_frontier, len(frontier))  
         if not found:  
-            temp = heapq.heappop(frontier)  
+            temp = heapq.heappop(frontier) if frontier else None  
+    stats.visited = len(visited)  
+    stats.add_phase("search", time.perf_counter() - search_started)  
+    if found:  
+        print("found")  
+        #display_sol(state)  
+        with stats.phase("write"):  
+            write_file(filename, found, format, started)  
+    return found  
   
   
 def copy(state0):  
@@ -421,88 +391,29 @@ def copy(state0):
     """  
     copy_pieces = []  
     for piece in state0.board.pieces:  
-        copy_pieces.append(Piece(piece.is_goal, piece.is_single, piece.coord_x, piece.coord_y, piece.orientation))  
-    copy_board = Board(copy_pieces)  
+        copy_pieces.append(Piece(piece.is_goal, piece.is_single, piece.coord_x, piece.coord_y, piece.orientation, piece.kind))  
+    copy_board = Board(copy_pieces, state0.board.geometry)  
     copy_state = State(copy_board, state0.f, state0.depth, state0.parent)  
     return copy_state  
   
-def neighbouring(visited, state0):  
-    init = copy(state0)  
+def neighbouring(visited, state0, stats=None):  
+    """ 
+    Unvisited states one move away from state0. 
+    """  
     moves = []  
-    for j in range(5):  
-        for i in range(10):  
-            if legal_move_check(i, state0.board, "left"):  
-                state0.board.pieces[i].move("left")  
-                new_board = Board(state0.board.pieces)  
-                new_state = State(new_board, state0.f+1, state0.depth+1)  
-                new_state.parent = state0  
-                new_hash = grid_hashing(new_board.grid)  
-                if new_hash not in visited:  
-                    moves.append(new_state)  
-                    visited.add(new_hash)  
-                    state0 = copy(init)  
-                    break  
-                else:  
-                    state0 = copy(init)  
-                      
-            if legal_move_check(i, state0.board, "up"):  
-                state0.board.pieces[i].move("up")  
-                new_board = Board(state0.board.pieces)  
-                new_state = State(new_board, state0.f+1, state0.depth+1)  
-                new_state.parent = state0
-                new_hash = grid_hashing(new_board.grid)  
-                if new_hash not in visited:  
-                    moves.append(new_state)  
-                    visited.add(new_hash)  
-                    state0 = copy(init)  
-                    break  
-                else:  
-                    state0 = copy(init)  
-                      
-            if legal_move_check(i, state0.board, "right"):  
-                state0.board.pieces[i].move("right")  
-                new_board = Board(state0.board.pieces)  
-                new_state = State(new_board, state0.f+1, state0.depth+1)  
-                new_state.parent = state0
-                new_hash = grid_hashing(new_board.grid)  
-                if new_hash not in visited:  
-                    moves.append(new_state)  
-                    visited.add(new_hash)  
-                    state0 = copy(init)  
-                    break  
-                else:  
-                    state0 = copy(init)  
-                      
-            if legal_move_check(i, state0.board, "down"):  
-                state0.board.pieces[i].move("down")  
-                new_board = Board(state0.board.pieces)  
-                new_state = State(new_board, state0.f+1, state0.depth+1)  
-                new_state.parent = state0  
-                new_hash = grid_hashing(new_board.grid)  
-                if new_hash not in visited:  
-                    moves.append(new_state)  
-                    visited.add(new_hash)  
-                    state0 = copy(init)  
-                    break  
-                else:  
-                    state0 = copy(init)  
+    geometry = state0.board.geometry  
+    children = bit_successors(board_to_bits(state0.board, geometry), geometry)  
+    for child in children:  
+        # the packed state is an exact key, so no reachable board is lost to a hash collision  
+        if child not in visited:  
+            moves.append(State(bits_to_board(child, geometry), state0.f+1, state0.depth+1, state0))  
+            visited.add(child)  
+    if stats is not None:  
+        stats.generated += len(children)  
+        stats.duplicates += len(children) - len(moves)  
     return moves  
 
 
-def grid_hashing(grid):
-    temp_list = []
-    for lst in grid:
-        temp_list+=lst
-    str0 = ' '.join(temp_list)
-    return hash(str0)
-      
-                      
-                  
-  
-          
-          
-          
-  
 def pruning(visited, new_state):  
     """ 
     check if the same board has reached previously, True if not 
@@ -526,7 +437,7 @@ def is_goal(state):
     """  
     for piece in state.board.pieces:  
         if piece.is_goal:  
-            return piece.coord_x == 1 and piece.coord_y == 3      
+            return (piece.coord_x, piece.coord_y) in state.board.geometry.goal  
   
   
   
@@ -537,6 +448,3833 @@ def is_goal(state):
       
   
   
+#====================================================================================
+# Packed (bitboard) engine
+#
+# A packed state is a plain int holding one occupancy field of width * height
+# bits per piece kind. Bit (kind * cells + y * width + x) is set when a piece
+# of that kind has its anchor on (x, y). The anchor of a piece is the first
+# cell it covers in reading order, which is the top left corner of every
+# standard piece. Pieces of the same kind are interchangeable, just as they
+# are in Board.grid, so equal layouts always pack to the same int.
+
+UNREACHABLE = 1 << 30
+
+# The standard piece catalog. A kind is drawn as rows of glyphs, with a space
+# for a cell the piece does not cover. Kind 0 is always the goal piece.
+STANDARD_KINDS = (
+    (char_goal * 2, char_goal * 2),
+    ('^', 'v'),
+    ('<>',),
+    (char_single,),
+)
+
+KIND_GOAL = 0
+KIND_VERT = 1
+KIND_HORIZ = 2
+KIND_SINGLE = 3
+
+DIRECTIONS = (("left", -1, 0), ("up", 0, -1), ("right", 1, 0), ("down", 0, 1))
+
+ZOBRIST_SEED = 0x6872640a
+
+
+class Geometry:
+    """
+    Board size, piece catalog, goal region and the bit tables for packed
+    states on that board. Built once and shared by every search running on it.
+    """
+
+    def __init__(self, width=4, height=5, goal=(1, 3), kinds=STANDARD_KINDS):
+        """
+        :param width: The number of columns of the board.
+        :type width: int
+        :param height: The number of rows of the board.
+        :type height: int
+        :param goal: The (x, y) cell the anchor of the goal piece must reach,
+            or a list of such cells.
+        :type goal: Union[Tuple[int, int], List[Tuple[int, int]]]
+        :param kinds: The piece catalog, drawn as in STANDARD_KINDS.
+        :type kinds: Sequence[Sequence[str]]
+        """
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.full = (1 << self.cells) - 1
+        self.kinds = len(kinds)
+
+        # glyphs[kind] lists ((dx, dy), glyph) for the cells of a piece,
+        # relative to its anchor; shapes[kind] has just the offsets
+        self.glyphs = []
+        for rows in kinds:
+            drawn = [(x, y, ch) for y, row in enumerate(rows) for x, ch in enumerate(row) if ch != ' ']
+            anchor_x, anchor_y = drawn[0][0], drawn[0][1]
+            self.glyphs.append([((x - anchor_x, y - anchor_y), ch) for x, y, ch in drawn])
+        self.shapes = [tuple(offset for offset, ch in glyphs) for glyphs in self.glyphs]
+
+        # Piece flags of each kind, so Pieces built without a kind still pack
+        self.flag_kinds = {}
+        for kind in range(self.kinds):
+            self.flag_kinds.setdefault(self.__flags(kind), kind)
+
+        if isinstance(goal[0], int):
+            goal = [goal]
+        for x, y in goal:
+            if not self.fits(self.shapes[KIND_GOAL], x, y):
+                raise ValueError("the goal piece does not fit at {}".format((x, y)))
+        self.goal = [tuple(cell) for cell in goal]
+        self.goal_cells = [y * width + x for x, y in self.goal]
+        self.goal_mask = 0
+        for cell in self.goal_cells:
+            self.goal_mask |= 1 << cell
+        # goal_distance[cell] is the manhattan distance from cell to the nearest goal cell
+        self.goal_distance = [min(abs(x - cell % width) + abs(y - cell // width) for x, y in self.goal)
+                              for cell in range(self.cells)]
+
+        # one random 64 bit word per state bit; a Zobrist key is the xor of the
+        # words of the bits that are set
+        rng = random.Random(ZOBRIST_SEED)
+        self.zobrist = [rng.getrandbits(64) for bit in range(self.kinds * self.cells)]
+
+        # shifts that turn a field of anchors into the cells it covers
+        self.cover_left = [[dy * width + dx for dx, dy in shape if dy * width + dx >= 0]
+                           for shape in self.shapes]
+        self.cover_right = [[-(dy * width + dx) for dx, dy in shape if dy * width + dx < 0]
+                            for shape in self.shapes]
+
+        self.__build_mirror()
+
+        # blank_moves[cell] lists (source bit, needed empty cells, xor mask,
+        # Zobrist delta) for every move that slides a piece onto cell; a
+        # move needing two empty cells is listed under the lower one.
+        self.blank_moves = [[] for cell in range(self.cells)]
+        for kind, shape in enumerate(self.shapes):
+            for cell in range(self.cells):
+                self.__add_moves(kind, shape, cell)
+
+        # covers[kind][cell] is the mask of the cells covered by a piece of
+        # that kind anchored on cell, or None if it does not fit there
+        self.covers = [[self.cover(shape, cell % width, cell // width)
+                        if self.fits(shape, cell % width, cell // width) else None
+                        for cell in range(self.cells)] for shape in self.shapes]
+
+        # placements[cell] maps a glyph to (kind, covered cells, [(cell, glyph)])
+        # for every piece that fits with its anchor on cell and is drawn there
+        # with that glyph, so text grids pack without building Pieces
+        self.placements = [{} for cell in range(self.cells)]
+        for kind, glyphs in enumerate(self.glyphs):
+            for cell in range(self.cells):
+                x, y = cell % width, cell // width
+                if self.covers[kind][cell] is not None:
+                    drawn = [((y + dy) * width + x + dx, ch) for (dx, dy), ch in glyphs]
+                    self.placements[cell].setdefault(drawn[0][1], []).append(
+                        (kind, self.covers[kind][cell], drawn))
+
+    def __flags(self, kind):
+        # (is_goal, is_single, orientation) of a Piece of this kind
+        shape = self.shapes[kind]
+        orientation = {((0, 0), (0, 1)): 'v', ((0, 0), (1, 0)): 'h'}.get(shape)
+        return kind == KIND_GOAL, len(shape) == 1, orientation
+
+    def __build_mirror(self):
+        # A left-right mirror turns a piece of one kind into a piece of the
+        # kind drawn as its reflection, and moves its anchor from column x to
+        # column width - 1 - x - reach, where reach is how far right the piece
+        # extends on its anchor row. Anchors that move by the same number of
+        # bits share one mask, so mirroring a whole state takes a handful of
+        # masks and shifts. The mirror of a layout is only an equivalent
+        # puzzle when every kind has a reflection in the catalog, the goal
+        # piece is its own reflection and the goal region is symmetric.
+        width = self.width
+        reflections = []
+        for shape in self.shapes:
+            reflected = sorted(((-dx, dy) for dx, dy in shape), key=lambda cell: (cell[1], cell[0]))
+            first_x = reflected[0][0]
+            reflected = set((dx - first_x, dy) for dx, dy in reflected)
+            matches = [kind for kind, other in enumerate(self.shapes) if set(other) == reflected]
+            reflections.append(matches[0] if matches else None)
+        reach = [max(dx for dx, dy in shape if dy == 0) for shape in self.shapes]
+
+        self.symmetric = None not in reflections and reflections[KIND_GOAL] == KIND_GOAL and \
+            set(self.goal) == set((width - 1 - x - reach[KIND_GOAL], y) for x, y in self.goal)
+        self.mirror_left = []
+        self.mirror_right = []
+        if not self.symmetric:
+            return
+        shifts = {}
+        for kind, shape in enumerate(self.shapes):
+            low = -min(dx for dx, dy in shape)
+            high = width - 1 - max(dx for dx, dy in shape)
+            for x in range(low, high + 1):
+                shift = (reflections[kind] - kind) * self.cells + width - 1 - reach[kind] - 2 * x
+                for y in range(self.height):
+                    shifts[shift] = shifts.get(shift, 0) | (1 << (kind * self.cells + y * width + x))
+        self.mirror_left = [(mask, shift) for shift, mask in shifts.items() if shift >= 0]
+        self.mirror_right = [(mask, -shift) for shift, mask in shifts.items() if shift < 0]
+
+    def __add_moves(self, kind, shape, cell):
+        x, y = cell % self.width, cell // self.width
+        if not self.fits(shape, x, y):
+            return
+        covered = self.cover(shape, x, y)
+        for name, dx, dy in DIRECTIONS:
+            if not self.fits(shape, x + dx, y + dy):
+                continue
+            need = self.cover(shape, x + dx, y + dy) & ~covered
+            dst = cell + dy * self.width + dx
+            src = kind * self.cells + cell
+            xor = (1 << src) | (1 << (kind * self.cells + dst))
+            delta = self.zobrist[src] ^ self.zobrist[kind * self.cells + dst]
+            lowest = (need & -need).bit_length() - 1
+            self.blank_moves[lowest].append((src, need, xor, delta))
+
+    def kind_of(self, piece):
+        """
+        The kind index of a Piece.
+        """
+        if piece.kind is not None:
+            return piece.kind
+        return self.flag_kinds[(piece.is_goal, piece.is_single, piece.orientation)]
+
+    def piece(self, kind, x, y):
+        """
+        A new Piece of the given kind with its anchor on (x, y).
+        """
+        is_goal, is_single, orientation = self.__flags(kind)
+        return Piece(is_goal, is_single, x, y, orientation, kind)
+
+    def fits(self, shape, x, y):
+        """
+        True if a piece with the given shape fits on the board at (x, y).
+        """
+        return all(0 <= x + dx < self.width and 0 <= y + dy < self.height for dx, dy in shape)
+
+    def cover(self, shape, x, y):
+        """
+        Mask of the cells covered by a piece with the given shape at (x, y).
+        """
+        mask = 0
+        for dx, dy in shape:
+            mask |= 1 << ((y + dy) * self.width + x + dx)
+        return mask
+
+    def field(self, state, kind):
+        """
+        Mask of the anchors of the pieces of one kind.
+        """
+        return (state >> (kind * self.cells)) & self.full
+
+    def empty(self, state):
+        """
+        Mask of the empty cells of a packed state.
+        """
+        cells = self.cells
+        full = self.full
+        occupied = 0
+        for kind in range(self.kinds):
+            field = (state >> (kind * cells)) & full
+            for shift in self.cover_left[kind]:
+                occupied |= field << shift
+            for shift in self.cover_right[kind]:
+                occupied |= field >> shift
+        return full & ~occupied
+
+    def mirror(self, state):
+        """
+        The left-right mirror image of a packed state.
+        """
+        mirrored = 0
+        for mask, shift in self.mirror_left:
+            mirrored |= (state & mask) << shift
+        for mask, shift in self.mirror_right:
+            mirrored |= (state & mask) >> shift
+        return mirrored
+
+    def canonical(self, state):
+        """
+        The smaller of a packed state and its mirror image, so both map to one
+        visited key. Identity when the board has no usable mirror symmetry.
+        """
+        if not self.symmetric:
+            return state
+        mirrored = self.mirror(state)
+        return mirrored if mirrored < state else state
+
+    def check_key_width(self, table):
+        """
+        Raise ValueError unless every db_key of this board fits in 64 bits,
+        as the files of table store them.
+        """
+        last_goal_cell = max(cell for cell in range(self.cells) if self.covers[KIND_GOAL][cell] is not None)
+        bits = last_goal_cell.bit_length() + (self.kinds - 1) * self.cells
+        if bits > 64:
+            raise ValueError("{} needs keys of at most 64 bits, and this board's take {}".format(table, bits))
+
+
+STANDARD = Geometry()
+
+
+def load_geometry(filename):
+    """
+    Load a board variant from a JSON file, for example
+    {"width": 5, "height": 6, "goal": [[1, 4], [2, 4]],
+     "pieces": [["11", "11"], ["^", "v"], ["<>"], ["2"], ["L ", "LL"]]}
+    The first piece is the goal piece, and goal lists the cells its anchor
+    may end on.
+
+    :param filename: The name of the given file.
+    :type filename: str
+    :rtype: Geometry
+    """
+    spec_file = open(filename, "r")
+    spec = json.load(spec_file)
+    spec_file.close()
+    return Geometry(spec["width"], spec["height"], [tuple(cell) for cell in spec["goal"]],
+                    [tuple(rows) for rows in spec["pieces"]])
+
+
+def board_to_bits(board, geometry=STANDARD):
+    """
+    Pack a Board into an int.
+
+    :param board: The board to pack.
+    :type board: Board
+    :return: The packed state
+    :rtype: int
+    """
+    state = 0
+    for piece in board.pieces:
+        kind = geometry.kind_of(piece)
+        state |= 1 << (kind * geometry.cells + piece.coord_y * geometry.width + piece.coord_x)
+    return state
+
+
+def bits_to_board(state, geometry=STANDARD):
+    """
+    Unpack an int built by board_to_bits into a Board.
+
+    :param state: The packed state.
+    :type state: int
+    :return: The unpacked board
+    :rtype: Board
+    """
+    pieces = []
+    for kind in range(geometry.kinds):
+        field = geometry.field(state, kind)
+        while field:
+            low = field & -field
+            cell = low.bit_length() - 1
+            field ^= low
+            pieces.append(geometry.piece(kind, cell % geometry.width, cell // geometry.width))
+    return Board(pieces, geometry)
+
+
+def bit_successors(state, geometry=STANDARD):
+    """
+    Packed states one move away from state, found by looking up which
+    pieces can slide onto each empty cell.
+    """
+    empty = geometry.empty(state)
+    blank_moves = geometry.blank_moves
+    children = []
+    blanks = empty
+    while blanks:
+        low = blanks & -blanks
+        blanks ^= low
+        for src, need, xor, delta in blank_moves[low.bit_length() - 1]:
+            if (state >> src) & 1 and empty & need == need:
+                children.append(state ^ xor)
+    return children
+
+
+def bit_keyed_successors(state, key, geometry=STANDARD):
+    """
+    Like bit_successors, but pairs each child with its Zobrist key, updated
+    from key with a single xor.
+
+    :param key: The Zobrist key of state, as returned by bit_zobrist.
+    :type key: int
+    :rtype: List[Tuple[int, int]]
+    """
+    empty = geometry.empty(state)
+    blank_moves = geometry.blank_moves
+    children = []
+    blanks = empty
+    while blanks:
+        low = blanks & -blanks
+        blanks ^= low
+        for src, need, xor, delta in blank_moves[low.bit_length() - 1]:
+            if (state >> src) & 1 and empty & need == need:
+                children.append((state ^ xor, key ^ delta))
+    return children
+
+
+def bit_zobrist(state, geometry=STANDARD):
+    """
+    Zobrist key of a packed state: a 64 bit hash that moves update in O(1).
+    The packed state itself stays the exact key for visited sets; the
+    Zobrist key is for fixed size tables and for spreading states over buckets.
+    """
+    key = 0
+    zobrist = geometry.zobrist
+    while state:
+        low = state & -state
+        state ^= low
+        key ^= zobrist[low.bit_length() - 1]
+    return key
+
+
+def bit_is_goal(state, geometry=STANDARD):
+    """
+    True if the goal piece of a packed state sits on the goal cell.
+    """
+    return state & geometry.goal_mask != 0
+
+
+def bit_manhattan(state, geometry=STANDARD):
+    """
+    Same as manhattan(), on a packed state.
+    """
+    return geometry.goal_distance[(state & geometry.full).bit_length() - 1]
+
+
+def bit_counts(state, geometry=STANDARD):
+    """
+    The number of pieces of each kind in a packed state.
+
+    :rtype: List[int]
+    """
+    return [bin(geometry.field(state, kind)).count('1') for kind in range(geometry.kinds)]
+
+
+def bit_goal_states(counts, geometry=STANDARD):
+    """
+    Every layout with the goal piece on one of its goal cells and the other
+    pieces placed anywhere they fit.
+
+    :param counts: The number of pieces of each kind, as from bit_counts.
+        Exactly one goal piece is expected.
+    :type counts: List[int]
+    :rtype: List[int]
+    """
+    remaining = list(counts)
+    remaining[KIND_GOAL] -= 1
+    goals = []
+    for cell in geometry.goal_cells:
+        cover = geometry.cover(geometry.shapes[KIND_GOAL], cell % geometry.width, cell // geometry.width)
+        goals.extend(bit_layouts(remaining, geometry, 1 << cell, cover))
+    return goals
+
+
+def bit_layouts(counts, geometry=STANDARD, state=0, filled=0):
+    """
+    Every layout of a piece set, or every way to add a piece set to a
+    partial layout.
+
+    :param counts: The number of pieces of each kind to place.
+    :type counts: List[int]
+    :param state: The packed partial layout.
+    :type state: int
+    :param filled: Mask of the cells the partial layout covers.
+    :type filled: int
+    :rtype: List[int]
+    """
+    remaining = list(counts)
+    blanks = geometry.cells - bin(filled).count("1") \
+        - sum(n * len(shape) for n, shape in zip(counts, geometry.shapes))
+    if blanks < 0:
+        return []
+    covers = []
+    for kind, shape in enumerate(geometry.shapes):
+        covers.append([geometry.cover(shape, cell % geometry.width, cell // geometry.width)
+                       if geometry.fits(shape, cell % geometry.width, cell // geometry.width) else None
+                       for cell in range(geometry.cells)])
+    layouts = []
+
+    def place(state, filled, blanks):
+        # fill the lowest free cell with a blank or with the anchor of a piece
+        free = geometry.full & ~filled
+        if not free:
+            layouts.append(state)
+            return
+        cell = (free & -free).bit_length() - 1
+        if blanks:
+            place(state, filled | (1 << cell), blanks - 1)
+        for kind in range(geometry.kinds):
+            cover = covers[kind][cell]
+            if remaining[kind] and cover is not None and not cover & filled:
+                remaining[kind] -= 1
+                place(state | (1 << (kind * geometry.cells + cell)), filled | cover, blanks)
+                remaining[kind] += 1
+
+    place(state, filled, blanks)
+    return layouts
+
+
+# Pattern databases
+#
+# A pattern keeps some kinds of pieces, drops the rest (their cells become
+# empty) and charges only for moves of some of the kept kinds; its table
+# holds the exact cost to a goal of every layout of the kept pieces. The
+# tables of patterns that charge different kinds are added, and when there
+# are several such groups the largest sum is taken. By default one group is
+# used: the goal and the larger pieces, charged for every move, and the goal
+# and the 1x1 pieces, charged only for moves of the 1x1 pieces. For
+# testhrd_hard1 those hold 4392 and 21840 layouts, against 53954 in its
+# distance database. A pattern file holds one table per pattern, each in the
+# format of a distance database with the group of the pattern in its header.
+
+
+class PatternDatabase:
+    """
+    Admissible heuristic built from exact distances in simplified puzzles.
+    Dropping pieces never blocks a move, and no move is charged by two
+    patterns of a group, so no group sum overestimates the real distance.
+    """
+
+    def __init__(self, counts, geometry=STANDARD, patterns=None):
+        """
+        :param counts: The number of pieces of each kind, as from bit_counts.
+        :type counts: List[int]
+        :param patterns: Groups of (kept kinds, charged kinds) patterns. No
+            kind may be charged by two patterns of one group, and every
+            pattern must keep the goal piece. By default one group, as above.
+        :type patterns: Optional[Sequence[Sequence[Tuple[Sequence[int], Sequence[int]]]]]
+        """
+        if patterns is None:
+            large = tuple(kind for kind, shape in enumerate(geometry.shapes)
+                          if kind == KIND_GOAL or len(shape) > 1)
+            small = tuple(kind for kind, shape in enumerate(geometry.shapes)
+                          if kind != KIND_GOAL and len(shape) == 1)
+            patterns = [[(large, large)] + ([((KIND_GOAL,) + small, small)] if small else [])]
+        self.counts = list(counts)
+        # per group, (counts of the kept pieces, mask of their fields, distances) per pattern
+        self.groups = []
+        for group in patterns:
+            self.groups.append([])
+            for kept, charged in group:
+                if KIND_GOAL not in kept:
+                    raise ValueError("every pattern must keep the goal piece")
+                pattern_counts = [n if kind in kept else 0 for kind, n in enumerate(counts)]
+                distance, depth = goal_distances(pattern_counts, geometry, charged)
+                self.groups[-1].append((pattern_counts, kept_mask(pattern_counts, geometry), distance))
+
+    def __call__(self, state, geometry=STANDARD):
+        """
+        Lower bound on the moves from state to a goal.
+        """
+        h = 0
+        for group in self.groups:
+            total = 0
+            for pattern_counts, mask, distance in group:
+                d = distance.get(state & mask)
+                if d is None:
+                    # the simplified puzzle is already unsolvable
+                    return UNREACHABLE
+                total += d
+            h = max(h, total)
+        return h
+
+    def save(self, filename, geometry=STANDARD):
+        """
+        Write the tables to a pattern file that PatternTable maps.
+
+        :return: The number of layouts written
+        :rtype: int
+        """
+        geometry.check_key_width("a pattern file")
+        pdb_file = open(filename, "wb")
+        written = 0
+        for index, group in enumerate(self.groups):
+            for pattern_counts, mask, distance in group:
+                written += write_table(pdb_file, distance, pattern_counts, geometry, index)
+        pdb_file.close()
+        return written
+
+
+def kept_mask(counts, geometry=STANDARD):
+    """
+    Mask of the fields of the kinds a pattern keeps, those with pieces in counts.
+    """
+    mask = 0
+    for kind, n in enumerate(counts):
+        if n:
+            mask |= geometry.full << (kind * geometry.cells)
+    return mask
+
+
+class PatternTable:
+    """
+    A pattern file written by PatternDatabase.save, used as the heuristic in
+    its place. Its counts are those of the full piece set, which every kind
+    kept by one of its patterns gives.
+    """
+
+    def __init__(self, filename, geometry=STANDARD):
+        """
+        :param filename: The pattern file.
+        :type filename: str
+        :param geometry: The board the file must have been built for.
+        :type geometry: Geometry
+        :raises ValueError: If the file is not a pattern file for this geometry
+        """
+        self.tables = []
+        offset = 0
+        size = os.path.getsize(filename)
+        try:
+            while offset < size:
+                self.tables.append(DistanceTable(filename, geometry, offset))
+                offset = self.tables[-1].end
+        except ValueError:
+            self.close()
+            raise
+        if not self.tables:
+            raise ValueError("{} is not a pattern file".format(filename))
+        self.counts = [max(counts) for counts in zip(*(table.counts for table in self.tables))]
+        # the tables of each group with the masks of their kept fields
+        groups = {}
+        for table in self.tables:
+            groups.setdefault(table.group, []).append((table, kept_mask(table.counts, geometry)))
+        self.groups = list(groups.values())
+
+    def __call__(self, state, geometry=STANDARD):
+        """
+        Lower bound on the moves from state to a goal.
+        """
+        h = 0
+        for group in self.groups:
+            total = 0
+            for table, mask in group:
+                d = table.distance(state & mask, geometry)
+                if d is None:
+                    return UNREACHABLE
+                total += d
+            h = max(h, total)
+        return h
+
+    def close(self):
+        for table in self.tables:
+            table.close()
+
+
+class SearchCancelled(Exception):
+    """
+    Raised inside a search when the cancel callback of its SearchStats
+    asks it to stop.
+    """
+
+
+class SearchStats:
+    """
+    Counters filled in by the searches: states expanded, successors
+    generated, successors dropped as already seen, the largest frontier
+    (the deepest path for idastar), the states stored at the end, and the
+    seconds spent in each named phase.
+
+    If cancel is set, searches call it every few hundred expansions and
+    stop with SearchCancelled once it returns True.
+    """
+
+    __slots__ = ('expanded', 'generated', 'duplicates', 'peak_frontier', 'visited', 'bound', 'phases',
+                 'cancel')
+
+    def __init__(self):
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.peak_frontier = 0
+        self.visited = 0
+        # for anytime: the returned path is at most bound times the optimal length
+        self.bound = None
+        self.phases = {}
+        self.cancel = None
+
+    def check(self):
+        """
+        Raise SearchCancelled if the search has been asked to stop.
+        """
+        if self.cancel is not None and self.cancel():
+            raise SearchCancelled()
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Add the time spent in a with block to the phase called name.
+        """
+        started = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_phase(name, time.perf_counter() - started)
+
+    def report(self):
+        """
+        The counters as a dict, for the --stats JSON report.
+        """
+        report = {name: getattr(self, name) for name in self.__slots__ if name not in ('phases', 'cancel')}
+        report['phases'] = {name: round(seconds, 6) for name, seconds in self.phases.items()}
+        return report
+
+
+class SamplingProfiler:
+    """
+    A statistical profiler: every interval seconds of CPU time, SIGPROF
+    interrupts the main thread and the functions on its stack are counted.
+    Its overhead depends on the interval, not on how many calls are made,
+    so it can run on full size inputs.
+    """
+
+    def __init__(self, interval=0.001):
+        """
+        :param interval: Seconds of CPU time between samples.
+        :type interval: float
+        """
+        self.interval = interval
+        self.samples = 0
+        self.own = Counter()
+        self.total = Counter()
+
+    def __sample(self, signum, frame):
+        self.samples += 1
+        seen = set()
+        leaf = True
+        while frame is not None:
+            code = frame.f_code
+            function = "{}:{} {}".format(os.path.basename(code.co_filename), code.co_firstlineno, code.co_name)
+            if leaf:
+                self.own[function] += 1
+                leaf = False
+            if function not in seen:
+                seen.add(function)
+                self.total[function] += 1
+            frame = frame.f_back
+
+    def __enter__(self):
+        signal.signal(signal.SIGPROF, self.__sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        return self
+
+    def __exit__(self, *exc_info):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def report(self, limit=30):
+        """
+        The functions seen most often at the top of the stack, with the
+        samples where each was running (own) or on the stack at all (total).
+        """
+        return {"interval": self.interval, "samples": self.samples,
+                "functions": [{"function": function, "own": own, "total": self.total[function]}
+                              for function, own in self.own.most_common(limit)]}
+
+
+def bit_path(parents, state):
+    """
+    Follow a {state: parent} map from state back to the start.
+
+    :return: The packed states from the start to state
+    :rtype: List[int]
+    """
+    path = []
+    while state is not None:
+        path.append(state)
+        state = parents[state]
+    path.reverse()
+    return path
+
+
+def bit_orient(keys, start, geometry=STANDARD):
+    """
+    Map a path of canonical keys back to real moves starting at start: each
+    step is whichever successor of the previous board has the next key.
+
+    :param keys: Canonical keys from canonical(start) to a goal.
+    :type keys: List[int]
+    :param start: The packed initial state, in its original orientation.
+    :type start: int
+    :rtype: List[int]
+    """
+    path = [start]
+    for key in keys[1:]:
+        for child in bit_successors(path[-1], geometry):
+            if geometry.canonical(child) == key:
+                path.append(child)
+                break
+    return path
+
+
+class NodeArena:
+    """
+    Search nodes as parallel arrays of states, parent indices and depths,
+    found by state through an open addressing table.
+    """
+
+    __slots__ = ('words', 'states', 'parent', 'depth', 'table', 'bits')
+
+    MIX = 0x9e3779b97f4a7c15
+
+    def __init__(self, geometry=STANDARD):
+        self.words = (geometry.kinds * geometry.cells + 63) // 64
+        self.states = array('Q')
+        self.parent = array('i')
+        self.depth = array('I')
+        self.bits = 10
+        self.table = array('i', [-1]) * (1 << self.bits)
+
+    def __len__(self):
+        return len(self.parent)
+
+    def state(self, index):
+        """
+        The packed state of a node.
+        """
+        words = self.words
+        if words == 1:
+            return self.states[index]
+        state = 0
+        for word in range(words):
+            state |= self.states[index * words + word] << (64 * word)
+        return state
+
+    def __slot(self, state):
+        return (((hash(state) * self.MIX) & 0xffffffffffffffff) >> (64 - self.bits))
+
+    def find(self, state):
+        """
+        The index of the node holding state, or -1.
+        """
+        table = self.table
+        mask = len(table) - 1
+        slot = self.__slot(state)
+        while True:
+            index = table[slot]
+            if index < 0 or self.state(index) == state:
+                return index
+            slot = (slot + 1) & mask
+
+    def add(self, state, parent, depth):
+        """
+        Store a new node, which must not be in the arena yet.
+
+        :return: The index of the node
+        :rtype: int
+        """
+        index = len(self.parent)
+        for word in range(self.words):
+            self.states.append((state >> (64 * word)) & 0xffffffffffffffff)
+        self.parent.append(parent)
+        self.depth.append(depth)
+        if 2 * (index + 1) > len(self.table):
+            self.bits += 1
+            self.table = array('i', [-1]) * (1 << self.bits)
+            for old in range(index + 1):
+                self.__insert(self.state(old), old)
+        else:
+            self.__insert(state, index)
+        return index
+
+    def __insert(self, state, index):
+        table = self.table
+        mask = len(table) - 1
+        slot = self.__slot(state)
+        while table[slot] >= 0:
+            slot = (slot + 1) & mask
+        table[slot] = index
+
+    def path(self, index):
+        """
+        The packed states from the root node to a node.
+
+        :rtype: List[int]
+        """
+        path = []
+        while index >= 0:
+            path.append(self.state(index))
+            index = self.parent[index]
+        path.reverse()
+        return path
+
+
+def bit_dfs(start, geometry=STANDARD, symmetry=False, stats=None):
+    """
+    dfs() on packed states.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param symmetry: Key visited states by their mirror-reduced canonical form.
+    :type symmetry: bool
+    :param stats: Counters to fill in, if any.
+    :type stats: Optional[SearchStats]
+    :return: The packed states from start to a goal, or None if there is none
+    :rtype: Optional[List[int]]
+    """
+    if stats is None:
+        stats = SearchStats()
+    if bit_is_goal(start, geometry):
+        return [start]
+    # with symmetry on, the arena holds canonical states; they are searched
+    # as they are and bit_orient turns the path back into real moves
+    key = geometry.canonical if symmetry else int
+    nodes = NodeArena(geometry)
+    frontier = array('i', [nodes.add(key(start), -1, 0)])
+    while frontier:
+        index = frontier.pop()
+        stats.expanded += 1
+        if stats.expanded & 0xff == 0:
+            stats.check()
+        depth = nodes.depth[index] + 1
+        children = bit_successors(nodes.state(index), geometry)
+        stats.generated += len(children)
+        for child in children:
+            child = key(child)
+            if nodes.find(child) >= 0:
+                stats.duplicates += 1
+                continue
+            child_index = nodes.add(child, index, depth)
+            if bit_is_goal(child, geometry):
+                stats.visited = len(nodes)
+                path = nodes.path(child_index)
+                return bit_orient(path, start, geometry) if symmetry else path
+            frontier.append(child_index)
+        if len(frontier) > stats.peak_frontier:
+            stats.peak_frontier = len(frontier)
+    stats.visited = len(nodes)
+    return None
+
+
+def bit_astar(start, geometry=STANDARD, symmetry=False, heuristic=bit_manhattan, stats=None, closed=None):
+    """
+    astar() on packed states.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param symmetry: Key visited states by their mirror-reduced canonical form.
+    :type symmetry: bool
+    :param heuristic: An admissible estimate called as heuristic(state, geometry),
+        such as bit_manhattan or a PatternDatabase.
+    :type heuristic: Callable[[int, Geometry], int]
+    :param stats: Counters to fill in, if any.
+    :type stats: Optional[SearchStats]
+    :param closed: Filled in with the depth of every expanded state, if given.
+    :type closed: Optional[Dict[int, int]]
+    :return: The packed states of a shortest path from start to a goal,
+        or None if there is none
+    :rtype: Optional[List[int]]
+    """
+    if stats is None:
+        stats = SearchStats()
+    key = geometry.canonical if symmetry else int
+    nodes = NodeArena(geometry)
+    # heap entries are single ints: f, then 0xffffffff - g so ties go to the
+    # deeper node, then the node index
+    frontier = [(heuristic(start, geometry) << 72) | (0xffffffff << 40) | nodes.add(key(start), -1, 0)]
+    while frontier:
+        entry = heappop(frontier)
+        index = entry & 0xffffffffff
+        g = 0xffffffff - ((entry >> 40) & 0xffffffff)
+        if g > nodes.depth[index]:
+            continue
+        state = nodes.state(index)
+        if bit_is_goal(state, geometry):
+            stats.visited = len(nodes)
+            path = nodes.path(index)
+            return bit_orient(path, start, geometry) if symmetry else path
+        stats.expanded += 1
+        if stats.expanded & 0xff == 0:
+            stats.check()
+        if closed is not None:
+            closed[state] = g
+        g += 1
+        children = bit_successors(state, geometry)
+        stats.generated += len(children)
+        for child in children:
+            child = key(child)
+            child_index = nodes.find(child)
+            if child_index < 0:
+                child_index = nodes.add(child, index, g)
+            elif nodes.depth[child_index] <= g:
+                stats.duplicates += 1
+                continue
+            else:
+                nodes.depth[child_index] = g
+                nodes.parent[child_index] = index
+            h = heuristic(child, geometry)
+            if h < UNREACHABLE:
+                heappush(frontier, ((g + h) << 72) | ((0xffffffff - g) << 40) | child_index)
+        if len(frontier) > stats.peak_frontier:
+            stats.peak_frontier = len(frontier)
+    stats.visited = len(nodes)
+    return None
+
+
+def bit_bibfs(start, geometry=STANDARD, stats=None):
+    """
+    Bidirectional breadth first search between start and every goal layout
+    with the same pieces. Each round expands one full level of the smaller
+    frontier and stops at the level where the two searches meet.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param stats: Counters to fill in, if any.
+    :type stats: Optional[SearchStats]
+    :return: The packed states of a shortest path from start to a goal,
+        or None if there is none
+    :rtype: Optional[List[int]]
+    """
+    if stats is None:
+        stats = SearchStats()
+    goals = bit_goal_states(bit_counts(start, geometry), geometry)
+    forward = {start: None}
+    backward = dict.fromkeys(goals)
+    if start in backward:
+        return [start]
+    forward_depth = {start: 0}
+    backward_depth = dict.fromkeys(goals, 0)
+    forward_frontier = [start]
+    backward_frontier = goals
+    while forward_frontier and backward_frontier:
+        stats.check()
+        if len(forward_frontier) <= len(backward_frontier):
+            stats.expanded += len(forward_frontier)
+            forward_frontier, meet = bibfs_level(forward_frontier, forward, forward_depth,
+                                                 backward_depth, geometry, stats)
+        else:
+            stats.expanded += len(backward_frontier)
+            backward_frontier, meet = bibfs_level(backward_frontier, backward, backward_depth,
+                                                  forward_depth, geometry, stats)
+        stats.peak_frontier = max(stats.peak_frontier, len(forward_frontier) + len(backward_frontier))
+        stats.visited = len(forward) + len(backward)
+        if meet is not None:
+            tail = bit_path(backward, meet)
+            tail.reverse()
+            return bit_path(forward, meet) + tail[1:]
+    return None
+
+
+def bibfs_level(frontier, parents, depth, other_depth, geometry=STANDARD, stats=None):
+    """
+    Expand one level of one side of bit_bibfs.
+
+    :return: The next frontier, and the state where the two sides meet on
+        the shortest combined path, or None if they did not meet
+    :rtype: Tuple[List[int], Optional[int]]
+    """
+    if stats is None:
+        stats = SearchStats()
+    next_frontier = []
+    meet = None
+    meet_length = None
+    for count, state in enumerate(frontier):
+        if count & 0xff == 0:
+            stats.check()
+        child_depth = depth[state] + 1
+        children = bit_successors(state, geometry)
+        stats.generated += len(children)
+        for child in children:
+            if child in parents:
+                stats.duplicates += 1
+                continue
+            parents[child] = state
+            depth[child] = child_depth
+            next_frontier.append(child)
+            if child in other_depth:
+                length = child_depth + other_depth[child]
+                if meet is None or length < meet_length:
+                    meet, meet_length = child, length
+    return next_frontier, meet
+
+
+# slots per bucket of a TranspositionTable
+TT_WAYS = 4
+
+
+class TranspositionTable:
+    """
+    Fixed size table of (state, g, iteration) entries indexed by Zobrist key,
+    in buckets of TT_WAYS slots. The stored state makes every hit exact, and
+    the size never grows. g and the iteration are 16 bit, so bit_idastar
+    stops before its bound reaches 0xffff.
+    """
+
+    def __init__(self, size):
+        """
+        :param size: The number of slots; rounded up to a power of two of at least TT_WAYS.
+        :type size: int
+        """
+        slots = 1 << max(size - 1, TT_WAYS - 1).bit_length()
+        self.mask = slots // TT_WAYS - 1
+        self.states = [None] * slots
+        self.g = array('H', bytes(2 * slots))
+        self.iteration = array('H', bytes(2 * slots))
+
+    def prune(self, state, key, g, iteration):
+        """
+        True if state was already reached at least as cheaply, so the branch
+        through it can be cut. Otherwise record it in its bucket, in place of
+        an empty slot, then an entry from an earlier iteration, then the
+        deepest entry. If every entry is of this iteration and shallower, the
+        last slot of the bucket takes it, so recent states are still kept.
+        """
+        states = self.states
+        depths = self.g
+        iterations = self.iteration
+        first = (key & self.mask) * TT_WAYS
+        victim = first
+        # the lowest rank is replaced: -1 for empty, 0 for stale, then by depth
+        lowest = 0x10000
+        for slot in range(first, first + TT_WAYS):
+            old = states[slot]
+            if old == state:
+                if depths[slot] < g or (depths[slot] == g and iterations[slot] == iteration):
+                    return True
+                depths[slot] = g
+                iterations[slot] = iteration
+                return False
+            if old is None:
+                rank = -1
+            elif iterations[slot] != iteration:
+                rank = 0
+            else:
+                rank = 0xffff - depths[slot]
+            if rank < lowest:
+                victim, lowest = slot, rank
+        if lowest > 0xffff - g:
+            victim = first + TT_WAYS - 1
+        states[victim] = state
+        depths[victim] = g
+        iterations[victim] = iteration
+        return False
+
+    def __len__(self):
+        """
+        The number of slots in use.
+        """
+        return len(self.states) - self.states.count(None)
+
+
+def bit_idastar(start, geometry=STANDARD, heuristic=bit_manhattan, table_size=1 << 20, stats=None):
+    """
+    Iterative deepening A*: depth first searches bounded by f = g + h, with the
+    bound raised to the smallest f that went over it until a goal is found.
+    Memory is the current path plus a TranspositionTable of table_size slots.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param heuristic: An admissible estimate called as heuristic(state, geometry).
+    :type heuristic: Callable[[int, Geometry], int]
+    :param table_size: Slots in the transposition table.
+    :type table_size: int
+    :param stats: Counters to fill in, if any.
+    :type stats: Optional[SearchStats]
+    :return: The packed states of a shortest path from start to a goal,
+        or None if there is none
+    :rtype: Optional[List[int]]
+    """
+    if stats is None:
+        stats = SearchStats()
+    table = TranspositionTable(table_size)
+    bound = heuristic(start, geometry)
+    iteration = 0
+    while bound < UNREACHABLE:
+        if bound >= 0xffff:
+            raise ValueError("idastar only searches to depths below {}".format(0xffff))
+        iteration += 1
+        path = [start]
+        keys = [bit_zobrist(start, geometry)]
+        # one iterator of (child, key) pairs per state on the path
+        stack = [iter(bit_keyed_successors(start, keys[0], geometry))]
+        stats.expanded += 1
+        table.prune(start, keys[0], 0, iteration)
+        if bit_is_goal(start, geometry):
+            return path
+        next_bound = UNREACHABLE
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                path.pop()
+                keys.pop()
+                continue
+            child, key = child
+            stats.generated += 1
+            g = len(path)
+            f = g + heuristic(child, geometry)
+            if f > bound:
+                next_bound = min(next_bound, f)
+                continue
+            if table.prune(child, key, g, iteration):
+                stats.duplicates += 1
+                continue
+            path.append(child)
+            keys.append(key)
+            if bit_is_goal(child, geometry):
+                stats.visited = len(table)
+                return path
+            stats.expanded += 1
+            if stats.expanded & 0xff == 0:
+                stats.check()
+            if len(path) > stats.peak_frontier:
+                stats.peak_frontier = len(path)
+            stack.append(iter(bit_keyed_successors(child, key, geometry)))
+        bound = next_bound
+    stats.visited = len(table)
+    return None
+
+
+#====================================================================================
+# Hints
+#
+# A HintSession answers "what is the best move from here" for a sequence of
+# nearby boards, as an interactive player produces them. Boards on a path it
+# already knows to be optimal are answered from that path. Otherwise it runs
+# A* with what earlier searches learned (adaptive A*): once a search from
+# some board finds a path of length c, every state x it expanded at depth g
+# is at least c - g moves from a goal, which is usually far more than the
+# heuristic says. States from which a search found no goal at all are
+# learned as unreachable.
+
+class HintSession:
+    """
+    Next best moves for boards of one geometry, reusing earlier searches.
+    """
+
+    def __init__(self, geometry=STANDARD, heuristic="manhattan", capacity=1 << 20, pdb=None):
+        """
+        :param heuristic: 'manhattan' or 'pdb', the estimate searches start from.
+        :type heuristic: str
+        :param pdb: Pattern file for the pdb heuristic, as for make_heuristic.
+        :type pdb: Optional[str]
+        :param capacity: The most states remembered; everything learned is
+            dropped once it is exceeded.
+        :type capacity: int
+        """
+        self.geometry = geometry
+        self.heuristic = heuristic
+        self.pdb = pdb
+        self.capacity = capacity
+        self.base = {}
+        # hints of the threads of one service go through the session one at a time
+        self.lock = threading.Lock()
+        # state -> (next state, moves left) along known optimal paths
+        self.path = {}
+        # state -> learned lower bound on the moves left
+        self.learned = {}
+
+    def __estimate(self, state, geometry):
+        return max(self.base(state, geometry), self.learned.get(state, 0))
+
+    def hint(self, state, stats=None):
+        """
+        The best move from state.
+
+        :param state: The packed board.
+        :type state: int
+        :param stats: Counters to fill in, if any.
+        :type stats: Optional[SearchStats]
+        :return: The board after the move and the moves left from state,
+            (None, 0) if state is a goal, or None if no goal can be reached
+        :rtype: Optional[Tuple[Optional[int], int]]
+        """
+        with self.lock:
+            return self.__hint(state, stats)
+
+    def __hint(self, state, stats):
+        geometry = self.geometry
+        if bit_is_goal(state, geometry):
+            return None, 0
+        if state in self.path:
+            return self.path[state]
+        if self.learned.get(state, 0) >= UNREACHABLE:
+            return None
+        if len(self.learned) + len(self.path) > self.capacity:
+            self.learned.clear()
+            self.path.clear()
+        self.base = make_heuristic(self.heuristic, state, geometry, self.pdb)
+        closed = {}
+        path = bit_astar(state, geometry, False, self.__estimate, stats, closed)
+        learned = self.learned
+        if path is None:
+            for expanded in closed:
+                learned[expanded] = UNREACHABLE
+            return None
+        cost = len(path) - 1
+        for expanded, g in closed.items():
+            if cost - g > learned.get(expanded, 0):
+                learned[expanded] = cost - g
+        for i in range(cost):
+            self.path[path[i]] = (path[i + 1], cost - i)
+        return self.path[state]
+
+
+#====================================================================================
+# Anytime weighted A*
+#
+# Weighted A* orders nodes by g + w * h, which finds a path quickly but may
+# return one up to w times too long. bit_anytime runs it with a falling
+# weight, each run pruning nodes that cannot beat the best path so far,
+# until the weight reaches 1 or the time budget runs out. The first run
+# always finishes, however long it takes, so a board is only reported
+# unsolvable when it is.
+
+ANYTIME_WEIGHTS = (50, 10, 5, 3, 2, 1.5, 1.25, 1)
+
+
+def bit_anytime(start, geometry=STANDARD, heuristic=bit_manhattan, time_budget=None,
+                weights=ANYTIME_WEIGHTS, on_solution=None, stats=None, deadline=None):
+    """
+    Anytime weighted A*.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param heuristic: An admissible estimate called as heuristic(state, geometry).
+    :type heuristic: Callable[[int, Geometry], int]
+    :param time_budget: Seconds to search for; None runs every weight to the end.
+    :type time_budget: Optional[float]
+    :param weights: The falling heuristic weights, ending with 1.
+    :type weights: Sequence[float]
+    :param on_solution: Called as on_solution(path, bound) with each better path.
+    :type on_solution: Optional[Callable[[List[int], float], None]]
+    :param stats: Counters to fill in, if any; stats.bound is set to the
+        suboptimality bound of the path returned.
+    :type stats: Optional[SearchStats]
+    :param deadline: The time.time() to stop at, in place of time_budget
+        from now; callers that build the heuristic first set it before.
+    :type deadline: Optional[float]
+    :return: The best path found from start to a goal, or None if there is none
+    :rtype: Optional[List[int]]
+    """
+    if stats is None:
+        stats = SearchStats()
+    if deadline is None and time_budget is not None:
+        deadline = time.time() + time_budget
+    best = None
+    # every path is at least this long
+    lower = heuristic(start, geometry)
+    for weight in weights:
+        # without a path yet there is nothing to report, so keep going
+        path, complete = anytime_pass(start, geometry, heuristic, weight, best,
+                                      deadline if best is not None else None, stats)
+        if path is not None:
+            best = path
+        if complete:
+            if best is None:
+                return None
+            # a finished pass with weight w finds a path within w times the
+            # optimum, or proves nothing shorter than best exists
+            lower = max(lower, (len(best) - 1) / weight if path is not None else len(best) - 1)
+        if best is not None:
+            stats.bound = round((len(best) - 1) / lower, 4) if lower else 1.0
+            if path is not None and on_solution is not None:
+                on_solution(best, stats.bound)
+        if not complete or stats.bound == 1.0:
+            break
+    return best
+
+
+def anytime_pass(start, geometry, heuristic, weight, best, deadline, stats):
+    """
+    One weighted A* run of bit_anytime, ignoring nodes whose unweighted f
+    is not below the length of best.
+
+    :return: A path shorter than best or None, and whether the run ended
+        before the deadline
+    :rtype: Tuple[Optional[List[int]], bool]
+    """
+    limit = UNREACHABLE if best is None else len(best) - 1
+    # f is kept in sixteenths so fractional weights still order as ints
+    scale = round(16 * weight)
+    nodes = NodeArena(geometry)
+    h = heuristic(start, geometry)
+    frontier = [((h * scale) << 72) | (0xffffffff << 40) | nodes.add(start, -1, 0)]
+    while frontier:
+        if deadline is not None and stats.expanded & 0xff == 0 and time.time() > deadline:
+            return None, False
+        entry = heappop(frontier)
+        index = entry & 0xffffffffff
+        g = 0xffffffff - ((entry >> 40) & 0xffffffff)
+        if g > nodes.depth[index]:
+            continue
+        state = nodes.state(index)
+        if bit_is_goal(state, geometry):
+            stats.visited = max(stats.visited, len(nodes))
+            return nodes.path(index), True
+        stats.expanded += 1
+        if stats.expanded & 0xff == 0:
+            stats.check()
+        g += 1
+        children = bit_successors(state, geometry)
+        stats.generated += len(children)
+        for child in children:
+            h = heuristic(child, geometry)
+            if g + h >= limit:
+                continue
+            child_index = nodes.find(child)
+            if child_index < 0:
+                child_index = nodes.add(child, index, g)
+            elif nodes.depth[child_index] <= g:
+                stats.duplicates += 1
+                continue
+            else:
+                nodes.depth[child_index] = g
+                nodes.parent[child_index] = index
+            heappush(frontier, ((16 * g + h * scale) << 72) | ((0xffffffff - g) << 40) | child_index)
+        if len(frontier) > stats.peak_frontier:
+            stats.peak_frontier = len(frontier)
+    stats.visited = max(stats.visited, len(nodes))
+    return None, True
+
+
+#====================================================================================
+# Hash distributed A*
+#
+# Every state is owned by one worker process, chosen by hashing the state.
+# A worker runs A* on the states it owns with its own open list and node
+# map, and sends the successors owned by other workers to them in batches.
+# The cost of the best goal found so far is shared: open nodes with f at or
+# above it are dropped, and the search ends when every worker is idle and no
+# batch is in transit, so the best goal left is optimal.
+
+HDA_BATCH = 256
+
+
+def hda_owner(state, workers):
+    """
+    The index of the worker that owns state.
+    """
+    return (((hash(state) * NodeArena.MIX) & 0xffffffffffffffff) >> 32) % workers
+
+
+def hda_worker(index, workers, start, geometry, heuristic, inboxes, results, sent, received,
+               idle, best, best_owner, pdb=None):
+    """
+    The body of one bit_hda worker process.
+
+    Its inbox receives ("states", [(g, state, parent), ...]) batches; once
+    the search is over, ("goal",) and ("parent", state) requests, answered
+    on results with the best goal it found and the parent of a state it
+    owns; and ("stop",), answered with its counters. sent and received count the
+    batches each worker (and, at the last index, bit_hda itself) has put
+    and got; idle is set while the worker has nothing below the best cost.
+    """
+    heuristic = make_heuristic(heuristic, start, geometry, pdb)
+    inbox = inboxes[index]
+    nodes = {}
+    frontier = []
+    outboxes = [[] for worker in range(workers)]
+    stats = SearchStats()
+    goal = None
+
+    def reach(g, state, parent):
+        old = nodes.get(state)
+        if old is not None and old[0] <= g:
+            stats.duplicates += 1
+            return
+        nodes[state] = (g, parent)
+        h = heuristic(state, geometry)
+        if h < UNREACHABLE and g + h < best.value:
+            heappush(frontier, (g + h, -g, state))
+
+    def send(worker):
+        inboxes[worker].put(("states", outboxes[worker]))
+        sent[index] += 1
+        outboxes[worker] = []
+
+    def take(message):
+        if message[0] == "states":
+            received[index] += 1
+            for g, state, parent in message[1]:
+                reach(g, state, parent)
+        elif message[0] == "goal":
+            results.put(goal)
+        elif message[0] == "parent":
+            results.put(nodes[message[1]][1])
+        else:
+            results.put((stats.expanded, stats.generated, stats.duplicates, len(nodes), stats.peak_frontier))
+            return False
+        return True
+
+    expansions = 0
+    while True:
+        if frontier and frontier[0][0] >= best.value:
+            frontier = []
+        if not frontier:
+            for worker in range(workers):
+                if outboxes[worker]:
+                    send(worker)
+            idle[index] = 1
+            message = inbox.get()
+            idle[index] = 0
+            if not take(message):
+                return
+            continue
+        expansions += 1
+        if expansions % 64 == 0:
+            try:
+                while True:
+                    if not take(inbox.get_nowait()):
+                        return
+            except Empty:
+                pass
+        f, g, state = heappop(frontier)
+        g = -g
+        if nodes[state][0] < g:
+            continue
+        if bit_is_goal(state, geometry):
+            with best.get_lock():
+                if g < best.value:
+                    best.value = g
+                    best_owner.value = index
+                    goal = state
+            continue
+        stats.expanded += 1
+        if len(frontier) > stats.peak_frontier:
+            stats.peak_frontier = len(frontier)
+        children = bit_successors(state, geometry)
+        stats.generated += len(children)
+        for child in children:
+            owner = hda_owner(child, workers)
+            if owner == index:
+                reach(g + 1, child, state)
+            else:
+                outboxes[owner].append((g + 1, child, state))
+                if len(outboxes[owner]) >= HDA_BATCH:
+                    send(owner)
+
+
+def bit_hda(start, geometry=STANDARD, heuristic="manhattan", workers=None, stats=None, pdb=None):
+    """
+    Hash distributed A* across worker processes.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param heuristic: 'manhattan' or 'pdb'; each worker builds its own.
+    :type heuristic: str
+    :param workers: Worker processes; defaults to the number of CPUs.
+    :type workers: Optional[int]
+    :param stats: Counters to fill in, if any; summed over the workers.
+    :type stats: Optional[SearchStats]
+    :param pdb: Pattern file for the pdb heuristic, as for make_heuristic.
+    :type pdb: Optional[str]
+    :return: The packed states of a shortest path from start to a goal,
+        or None if there is none
+    :rtype: Optional[List[int]]
+    """
+    if stats is None:
+        stats = SearchStats()
+    if bit_is_goal(start, geometry):
+        return [start]
+    workers = workers or os.cpu_count() or 1
+    inboxes = [multiprocessing.Queue() for worker in range(workers)]
+    results = multiprocessing.Queue()
+    sent = multiprocessing.Array('q', workers + 1, lock=False)
+    received = multiprocessing.Array('q', workers + 1, lock=False)
+    idle = multiprocessing.Array('b', workers, lock=False)
+    best = multiprocessing.Value('q', UNREACHABLE)
+    best_owner = multiprocessing.Value('i', -1)
+    processes = [multiprocessing.Process(target=hda_worker, daemon=True,
+                                         args=(index, workers, start, geometry, heuristic, inboxes,
+                                               results, sent, received, idle, best, best_owner, pdb))
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+    try:
+        inboxes[hda_owner(start, workers)].put(("states", [(0, start, None)]))
+        sent[workers] += 1
+        # the search is over once two snapshots in a row find every worker
+        # idle, every batch sent also received, and no counter changed
+        previous = None
+        while True:
+            time.sleep(0.001)
+            stats.check()
+            snapshot = (all(idle), tuple(sent), tuple(received))
+            if snapshot[0] and sum(snapshot[1]) == sum(snapshot[2]) and snapshot == previous:
+                break
+            previous = snapshot
+        path = None
+        if best_owner.value >= 0:
+            # walk back from the best goal, asking the owner of each state for its parent
+            inboxes[best_owner.value].put(("goal",))
+            path = []
+            state = results.get()
+            while state is not None:
+                path.append(state)
+                inboxes[hda_owner(state, workers)].put(("parent", state))
+                state = results.get()
+            path.reverse()
+        for inbox in inboxes:
+            inbox.put(("stop",))
+        for worker in range(workers):
+            expanded, generated, duplicates, visited, peak_frontier = results.get()
+            stats.expanded += expanded
+            stats.generated += generated
+            stats.duplicates += duplicates
+            stats.visited += visited
+            stats.peak_frontier = max(stats.peak_frontier, peak_frontier)
+        for process in processes:
+            process.join()
+        return path
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+
+#====================================================================================
+# Vectorized breadth first search
+#
+# A level of the search is a numpy array with one row per packed state, the
+# state split into 64 bit words. Successors of a whole level are made one
+# move at a time with masks, and each new level is deduplicated by sorting.
+# numpy is an optional dependency, needed only by --algo vbfs and
+# --enumerate and imported only when one of them runs; install it with
+# pip install numpy. Every other algorithm runs on the standard library.
+
+# per-geometry move masks for vector_levels, built once per process
+vector_tables = {}
+
+
+def import_numpy():
+    """
+    The numpy module, or an ImportError that says which option needs it.
+    """
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("the vbfs engine needs numpy; install it with pip install numpy") from None
+    return numpy
+
+
+class VectorMoves:
+    """
+    The tables of one geometry as numpy constants: where each kind's field
+    sits in the words of a row and which cells it covers, and for every move
+    the word and bit of its source anchor, the empty cells it needs and the
+    words it flips.
+    """
+
+    def __init__(self, geometry, numpy):
+        if geometry.cells > 64:
+            raise ValueError("the vbfs engine only supports boards of at most 64 cells")
+        self.words = (geometry.kinds * geometry.cells + 63) // 64
+        self.full = numpy.uint64(geometry.full)
+        self.fields = []
+        for kind in range(geometry.kinds):
+            word, offset = divmod(kind * geometry.cells, 64)
+            spill = offset + geometry.cells > 64
+            self.fields.append((word, offset, spill, geometry.cover_left[kind], geometry.cover_right[kind]))
+        moves = [move for cell_moves in geometry.blank_moves for move in cell_moves]
+        self.source = [divmod(src, 64) for src, need, xor, delta in moves]
+        self.need = [numpy.uint64(need) for src, need, xor, delta in moves]
+        self.xor = numpy.array([split_words(xor, self.words) for src, need, xor, delta in moves],
+                               dtype=numpy.uint64)
+
+    def field(self, rows, kind, numpy):
+        word, offset, spill, left, right = self.fields[kind]
+        field = rows[:, word] >> numpy.uint64(offset)
+        if spill:
+            field |= rows[:, word + 1] << numpy.uint64(64 - offset)
+        return field & self.full
+
+    def empty(self, rows, numpy):
+        occupied = numpy.zeros(len(rows), dtype=numpy.uint64)
+        for kind, (word, offset, spill, left, right) in enumerate(self.fields):
+            field = self.field(rows, kind, numpy)
+            for shift in left:
+                occupied |= field << numpy.uint64(shift)
+            for shift in right:
+                occupied |= field >> numpy.uint64(shift)
+        return ~occupied & self.full
+
+    def successors(self, rows, numpy):
+        """
+        Every successor of every row, with repeats.
+        """
+        empty = self.empty(rows, numpy)
+        children = []
+        for (word, bit), need, xor in zip(self.source, self.need, self.xor):
+            movable = ((rows[:, word] >> numpy.uint64(bit)) & numpy.uint64(1)).astype(bool)
+            movable &= (empty & need) == need
+            if movable.any():
+                children.append(rows[movable] ^ xor)
+        if not children:
+            return numpy.zeros((0, self.words), dtype=numpy.uint64)
+        return numpy.concatenate(children)
+
+
+def split_words(state, words):
+    """
+    A packed state as a list of 64 bit words, lowest first.
+    """
+    return [(state >> (64 * word)) & 0xffffffffffffffff for word in range(words)]
+
+
+def row_keys(rows, numpy):
+    """
+    One sortable value per row, so rows of several words sort and compare
+    as single items.
+    """
+    rows = numpy.ascontiguousarray(rows)
+    return rows.view(numpy.dtype((numpy.void, 8 * rows.shape[1]))).ravel()
+
+
+def vector_levels(start, geometry=STANDARD, stats=None, stop_at_goal=False):
+    """
+    Level synchronous breadth first search from start.
+
+    Moves are reversible, so a successor of level d is either new or in
+    level d - 1 or d; new levels are deduplicated against those two sorted
+    arrays only, and the earlier levels are kept just to be returned.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param stats: Counters to fill in, if any.
+    :type stats: Optional[SearchStats]
+    :param stop_at_goal: Stop after the first level holding a goal layout.
+    :type stop_at_goal: bool
+    :return: The sorted numpy array of packed states (one row of 64 bit
+        words each) at every depth from start
+    :rtype: List[numpy.ndarray]
+    """
+    numpy = import_numpy()
+    if stats is None:
+        stats = SearchStats()
+    if geometry not in vector_tables:
+        vector_tables[geometry] = VectorMoves(geometry, numpy)
+    moves = vector_tables[geometry]
+    goal_mask = numpy.uint64(geometry.goal_mask)
+    level = numpy.array([split_words(start, moves.words)], dtype=numpy.uint64)
+    levels = [level]
+    previous = row_keys(level[:0], numpy)
+    current = row_keys(level, numpy)
+    while len(level):
+        if stop_at_goal and (level[:, 0] & goal_mask).any():
+            break
+        stats.expanded += len(level)
+        stats.check()
+        children = moves.successors(level, numpy)
+        stats.generated += len(children)
+        keys = numpy.unique(row_keys(children, numpy))
+        keys = keys[~numpy.isin(keys, current, assume_unique=True)]
+        keys = keys[~numpy.isin(keys, previous, assume_unique=True)]
+        stats.duplicates += len(children) - len(keys)
+        previous, current = current, keys
+        level = keys.view(numpy.uint64).reshape(-1, moves.words)
+        if len(level):
+            levels.append(level)
+        stats.peak_frontier = max(stats.peak_frontier, len(level))
+    stats.visited = sum(len(level) for level in levels)
+    return levels
+
+
+def bit_vbfs(start, geometry=STANDARD, stats=None):
+    """
+    Breadth first search with vector_levels, then a walk back from a goal of
+    the last level through a neighbour in each level before it.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param stats: Counters to fill in, if any.
+    :type stats: Optional[SearchStats]
+    :return: The packed states of a shortest path from start to a goal,
+        or None if there is none
+    :rtype: Optional[List[int]]
+    """
+    numpy = import_numpy()
+    levels = vector_levels(start, geometry, stats, stop_at_goal=True)
+    goal_mask = numpy.uint64(geometry.goal_mask)
+    goals = levels[-1][(levels[-1][:, 0] & goal_mask) != 0]
+    if not len(goals):
+        return None
+    state = sum(int(word) << (64 * i) for i, word in enumerate(goals[0]))
+    path = [state]
+    for level in reversed(levels[:-1]):
+        keys = row_keys(level, numpy)
+        for child in bit_successors(state, geometry):
+            key = row_keys(numpy.array([split_words(child, level.shape[1])], dtype=numpy.uint64), numpy)
+            i = numpy.searchsorted(keys, key)[0]
+            if i < len(keys) and keys[i] == key[0]:
+                state = child
+                break
+        path.append(state)
+    path.reverse()
+    return path
+
+
+#====================================================================================
+# External memory breadth first search
+#
+# Every level of the search lives in a file of sorted, fixed width,
+# big-endian state records, so byte order is numeric order. Successors are
+# gathered in memory only up to a bounded number, then sorted and written
+# out as a run. Once a level is expanded its runs are merged and the
+# states of the two previous levels removed in the same pass (delayed
+# duplicate detection); as moves are reversible, no older level can hold a
+# successor. Memory use is the run buffer plus one record per open file.
+
+SPILL_READ = 4096
+
+
+def spill_write(states, filename, width):
+    """
+    Write sorted states to filename as width byte records.
+
+    :return: The number of records written
+    :rtype: int
+    """
+    count = 0
+    spill_file = open(filename, "wb", buffering=1 << 16)
+    for state in states:
+        spill_file.write(state.to_bytes(width, "big"))
+        count += 1
+    spill_file.close()
+    return count
+
+
+def spill_read(filename, width):
+    """
+    The states of a file written by spill_write, in order.
+    """
+    spill_file = open(filename, "rb")
+    try:
+        while True:
+            chunk = spill_file.read(width * SPILL_READ)
+            if not chunk:
+                return
+            for offset in range(0, len(chunk), width):
+                yield int.from_bytes(chunk[offset:offset + width], "big")
+    finally:
+        spill_file.close()
+
+
+def spill_contains(spill_file, count, width, state):
+    """
+    True if state is one of the count records of an open spill file,
+    found by binary search.
+    """
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        spill_file.seek(middle * width)
+        found = int.from_bytes(spill_file.read(width), "big")
+        if found == state:
+            return True
+        if found < state:
+            low = middle + 1
+        else:
+            high = middle
+    return False
+
+
+def spill_merge(runs, older, width, filename, geometry=STANDARD):
+    """
+    Merge sorted run files into filename, dropping repeats and every state
+    found in the sorted files older.
+
+    :return: The number of states written, and whether one of them is a goal
+    :rtype: Tuple[int, bool]
+    """
+    merged = heapq.merge(*(spill_read(run, width) for run in runs))
+    olds = [spill_read(old, width) for old in older]
+    heads = [next(old, None) for old in olds]
+    count = 0
+    goal = False
+    last = None
+    spill_file = open(filename, "wb", buffering=1 << 16)
+    for state in merged:
+        if state == last:
+            continue
+        last = state
+        seen = False
+        for i, old in enumerate(olds):
+            while heads[i] is not None and heads[i] < state:
+                heads[i] = next(old, None)
+            seen = seen or heads[i] == state
+        if seen:
+            continue
+        spill_file.write(state.to_bytes(width, "big"))
+        count += 1
+        goal = goal or bit_is_goal(state, geometry)
+    spill_file.close()
+    return count, goal
+
+
+def bit_external(start, geometry=STANDARD, memory=1 << 20, directory=None, stats=None):
+    """
+    Breadth first search that keeps its levels on disk.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param memory: The most successors held in memory before a run is written.
+    :type memory: int
+    :param directory: Where the level and run files are made; a temporary
+        directory inside it is removed when the search ends.
+    :type directory: Optional[str]
+    :param stats: Counters to fill in, if any.
+    :type stats: Optional[SearchStats]
+    :return: The packed states of a shortest path from start to a goal,
+        or None if there is none
+    :rtype: Optional[List[int]]
+    """
+    if stats is None:
+        stats = SearchStats()
+    if bit_is_goal(start, geometry):
+        return [start]
+    width = (geometry.kinds * geometry.cells + 7) // 8
+    workdir = tempfile.mkdtemp(prefix="hrd-", dir=directory)
+    try:
+        levels = [os.path.join(workdir, "level0")]
+        counts = [spill_write([start], levels[0], width)]
+        stats.visited = 1
+        goal = False
+        while counts[-1] and not goal:
+            depth = len(levels)
+            runs = []
+            buffer = []
+            for state in spill_read(levels[-1], width):
+                stats.expanded += 1
+                if stats.expanded & 0xff == 0:
+                    stats.check()
+                children = bit_successors(state, geometry)
+                stats.generated += len(children)
+                buffer.extend(children)
+                if len(buffer) >= memory:
+                    runs.append(os.path.join(workdir, "run{}-{}".format(depth, len(runs))))
+                    spill_write(sorted(set(buffer)), runs[-1], width)
+                    buffer = []
+            if buffer:
+                runs.append(os.path.join(workdir, "run{}-{}".format(depth, len(runs))))
+                spill_write(sorted(set(buffer)), runs[-1], width)
+            levels.append(os.path.join(workdir, "level{}".format(depth)))
+            count, goal = spill_merge(runs, levels[-3:-1], width, levels[-1], geometry)
+            for run in runs:
+                os.remove(run)
+            counts.append(count)
+            stats.visited += count
+            stats.peak_frontier = max(stats.peak_frontier, count)
+        stats.duplicates = stats.generated - stats.visited + 1
+        if not goal:
+            return None
+        return spill_path(levels, counts, width, geometry)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def spill_path(levels, counts, width, geometry=STANDARD):
+    """
+    Walk back from a goal of the last level of bit_external through a
+    neighbour in each level before it.
+    """
+    state = next(state for state in spill_read(levels[-1], width) if bit_is_goal(state, geometry))
+    path = [state]
+    for level, count in zip(reversed(levels[:-1]), reversed(counts[:-1])):
+        level_file = open(level, "rb")
+        state = next(child for child in bit_successors(state, geometry)
+                     if spill_contains(level_file, count, width, child))
+        level_file.close()
+        path.append(state)
+    path.reverse()
+    return path
+
+
+#====================================================================================
+# Distance database
+#
+# A database file holds the exact distance to the nearest goal for every
+# layout of one piece set that can reach a goal. The layout is a 16 byte
+# header with the board's width, height and number of kinds, the piece
+# counts padded to 8 bytes, then the sorted 64 bit keys of all those
+# layouts, then their distances in the same order, padded to 8 bytes.
+# Lookups binary search the memory-mapped keys. A pattern file is several
+# such tables back to back, and the group byte of the header is only used
+# there.
+
+DB_MAGIC = b'HRD2'
+DB_HEADER = struct.Struct('=4s3BcBxxxI')
+
+
+def pack_counts(counts):
+    """
+    The piece counts of a table header, padded to 8 bytes.
+    """
+    return bytes(counts).ljust((len(counts) + 7) // 8 * 8, b'\0')
+
+
+def check_table_geometry(filename, width, height, kinds, geometry=STANDARD):
+    """
+    Raise ValueError unless a table was built for a board of this geometry's
+    size and number of kinds.
+    """
+    if (width, height, kinds) != (geometry.width, geometry.height, geometry.kinds):
+        raise ValueError("{} was built for a {}x{} board with {} kinds of piece, not {}x{} with {}".format(
+            filename, width, height, kinds, geometry.width, geometry.height, geometry.kinds))
+
+
+def db_key(state, geometry=STANDARD):
+    """
+    The key of a packed board with one goal piece: the goal piece's cell
+    above the fields of the other kinds. 64 bits on the standard board.
+    """
+    return (((state & geometry.full).bit_length() - 1) << ((geometry.kinds - 1) * geometry.cells)) \
+        | (state >> geometry.cells)
+
+
+def db_state(key, geometry=STANDARD):
+    """
+    Inverse of db_key.
+    """
+    shift = (geometry.kinds - 1) * geometry.cells
+    return ((key & ((1 << shift) - 1)) << geometry.cells) | (1 << (key >> shift))
+
+
+def goal_distances(counts, geometry=STANDARD, charged=None):
+    """
+    Run a breadth first search backwards from every goal layout of a piece
+    set. Moves are reversible, so this finds the distance to the nearest goal
+    of every layout that can reach one.
+
+    :param counts: The number of pieces of each kind, as from bit_counts.
+    :type counts: List[int]
+    :param charged: Only moves of these kinds count, for pattern databases;
+        every move counts if None.
+    :type charged: Optional[Sequence[int]]
+    :return: The distance of each packed layout reached, and the largest distance
+    :rtype: Tuple[Dict[int, int], int]
+    """
+    frontier = bit_goal_states(counts, geometry)
+    distance = dict.fromkeys(frontier, 0)
+    depth = 0
+    while frontier:
+        next_frontier = []
+        # a free move keeps its child at this depth, so it joins the level
+        # being expanded, even if a charged move reached it first
+        for state in frontier:
+            for child in bit_successors(state, geometry):
+                d = distance.get(child)
+                if charged is not None and ((state & ~child).bit_length() - 1) // geometry.cells not in charged:
+                    if d is None or d > depth:
+                        distance[child] = depth
+                        frontier.append(child)
+                elif d is None:
+                    distance[child] = depth + 1
+                    next_frontier.append(child)
+        if charged is not None:
+            next_frontier = [state for state in next_frontier if distance[state] > depth]
+        if next_frontier:
+            depth += 1
+        frontier = next_frontier
+    return distance, depth
+
+
+def build_db(counts, filename, geometry=STANDARD):
+    """
+    Run a breadth first search backwards from every goal layout of a piece
+    set and write the distance of each layout it reaches to filename.
+
+    :param counts: The number of pieces of each kind, as from bit_counts.
+    :type counts: List[int]
+    :param filename: The database file to write.
+    :type filename: str
+    :return: The number of layouts written
+    :rtype: int
+    """
+    geometry.check_key_width("the distance database")
+    distance, depth = goal_distances(counts, geometry)
+    db_file = open(filename, "wb")
+    written = write_table(db_file, distance, counts, geometry)
+    db_file.close()
+    return written
+
+
+def write_table(db_file, distance, counts, geometry=STANDARD, group=0):
+    """
+    Write one table in the database format to an open file.
+
+    :param distance: The distance of each packed layout, as from goal_distances.
+    :type distance: Dict[int, int]
+    :param group: The group of a pattern table; 0 for a distance database.
+    :type group: int
+    :return: The number of layouts written
+    :rtype: int
+    """
+    keys = sorted((db_key(state, geometry), d) for state, d in distance.items())
+    typecode = 'B' if max(distance.values()) <= 0xff else 'H'
+    db_file.write(DB_HEADER.pack(DB_MAGIC, geometry.width, geometry.height, geometry.kinds,
+                                 typecode.encode(), group, len(keys)))
+    db_file.write(pack_counts(counts))
+    array('Q', (key for key, d in keys)).tofile(db_file)
+    array(typecode, (d for key, d in keys)).tofile(db_file)
+    db_file.write(b"\0" * (-db_file.tell() % 8))
+    return len(keys)
+
+
+class DistanceTable:
+    """
+    A memory-mapped database written by build_db, or one table of a pattern file.
+    """
+
+    def __init__(self, filename, geometry=STANDARD, offset=0):
+        """
+        :param filename: The database file.
+        :type filename: str
+        :param geometry: The board the table must have been built for.
+        :type geometry: Geometry
+        :param offset: Where the table starts in the file; its end is kept in end.
+        :type offset: int
+        :raises ValueError: If the file is not a database for this geometry
+        """
+        self.file = open(filename, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < offset + DB_HEADER.size or self.map[offset:offset + 4] != DB_MAGIC:
+            self.close()
+            raise ValueError("{} is not a distance database".format(filename))
+        magic, width, height, kinds, typecode, group, size = DB_HEADER.unpack_from(self.map, offset)
+        try:
+            check_table_geometry(filename, width, height, kinds, geometry)
+        except ValueError:
+            self.close()
+            raise
+        start = offset + DB_HEADER.size
+        self.counts = list(self.map[start:start + kinds])
+        self.group = group
+        self.size = size
+        start += (kinds + 7) // 8 * 8
+        end = start + 8 * size
+        self.end = end + array(typecode.decode()).itemsize * size
+        self.keys = memoryview(self.map)[start:end].cast('Q')
+        self.distances = memoryview(self.map)[end:self.end].cast(typecode.decode())
+        self.end += -self.end % 8
+
+    def distance(self, state, geometry=STANDARD):
+        """
+        Moves from state to the nearest goal, or None if no goal is reachable.
+        """
+        key = db_key(state, geometry)
+        i = bisect.bisect_left(self.keys, key)
+        if i < self.size and self.keys[i] == key:
+            return self.distances[i]
+        return None
+
+    def close(self):
+        for view in ("keys", "distances"):
+            if hasattr(self, view):
+                getattr(self, view).release()
+        self.map.close()
+        self.file.close()
+
+
+def db_solve(start, table, geometry=STANDARD, stats=None):
+    """
+    Walk from start to a goal by always moving to a board one step closer,
+    as recorded in a DistanceTable. No search is done.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param table: A database built for the piece set of start.
+    :type table: DistanceTable
+    :param stats: Counters to fill in, if any.
+    :type stats: Optional[SearchStats]
+    :return: The packed states of a shortest path from start to a goal,
+        or None if there is none
+    :rtype: Optional[List[int]]
+    :raises ValueError: If the table is for another piece set, or has no
+        board one move closer to a goal where it should
+    """
+    if bit_counts(start, geometry) != table.counts:
+        raise ValueError("the database was built for a different piece set")
+    d = table.distance(start, geometry)
+    if d is None:
+        return None
+    if stats is None:
+        stats = SearchStats()
+    path = [start]
+    while d > 0:
+        stats.expanded += 1
+        for child in bit_successors(path[-1], geometry):
+            stats.generated += 1
+            if table.distance(child, geometry) == d - 1:
+                path.append(child)
+                d -= 1
+                break
+        else:
+            raise ValueError("the database is inconsistent: no move leads from a board {} moves "
+                             "from a goal to one {} moves away".format(d, d - 1))
+    return path
+
+
+#====================================================================================
+# Component table
+#
+# A component file labels every layout of one piece set with its connected
+# component under moves, and records for each component its size, whether
+# it holds a goal layout and, if so, its layout farthest from a goal. The
+# layout is a 16 byte header with the board's width, height and number of
+# kinds, the piece counts padded to 8 bytes, the sorted db_key of every
+# layout, the hardest layout of every component (0 if it has no goal), the
+# component of every layout, the size of every component and the goal
+# distance of every component's hardest layout (0xffff if it has no goal).
+# Lookups binary search the memory-mapped keys.
+
+COMPONENT_MAGIC = b'HRC2'
+COMPONENT_HEADER = struct.Struct('=4s3BxII')
+NO_GOAL = 0xffff
+
+
+def build_components(counts, filename, geometry=STANDARD):
+    """
+    Label every layout of a piece set with its component and write the
+    table to filename.
+
+    :param counts: The number of pieces of each kind, as from bit_counts.
+    :type counts: List[int]
+    :param filename: The component file to write.
+    :type filename: str
+    :return: The number of layouts and of components written
+    :rtype: Tuple[int, int]
+    """
+    geometry.check_key_width("the component table")
+    distance, depth = goal_distances(counts, geometry)
+    label = {}
+    sizes = []
+    hardest = []
+    depths = []
+    for layout in bit_layouts(counts, geometry):
+        if layout in label:
+            continue
+        component = len(sizes)
+        label[layout] = component
+        frontier = [layout]
+        size = 0
+        far, far_distance = 0, NO_GOAL
+        while frontier:
+            state = frontier.pop()
+            size += 1
+            d = distance.get(state)
+            if d is not None and (far_distance == NO_GOAL or d > far_distance):
+                far, far_distance = state, d
+            for child in bit_successors(state, geometry):
+                if child not in label:
+                    label[child] = component
+                    frontier.append(child)
+        sizes.append(size)
+        hardest.append(db_key(far, geometry) if far_distance != NO_GOAL else 0)
+        depths.append(far_distance)
+
+    keys = sorted((db_key(state, geometry), component) for state, component in label.items())
+    component_file = open(filename, "wb")
+    component_file.write(COMPONENT_HEADER.pack(COMPONENT_MAGIC, geometry.width, geometry.height,
+                                               geometry.kinds, len(keys), len(sizes)))
+    component_file.write(pack_counts(counts))
+    array('Q', (key for key, component in keys)).tofile(component_file)
+    array('Q', hardest).tofile(component_file)
+    array('I', (component for key, component in keys)).tofile(component_file)
+    array('I', sizes).tofile(component_file)
+    array('H', depths).tofile(component_file)
+    component_file.close()
+    return len(keys), len(sizes)
+
+
+class ComponentTable:
+    """
+    A memory-mapped component file written by build_components.
+    """
+
+    def __init__(self, filename, geometry=STANDARD):
+        """
+        :param filename: The component file.
+        :type filename: str
+        :param geometry: The board the table must have been built for.
+        :type geometry: Geometry
+        :raises ValueError: If the file is not a component table for this geometry
+        """
+        self.file = open(filename, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.views = []
+        if len(self.map) < COMPONENT_HEADER.size or self.map[:4] != COMPONENT_MAGIC:
+            self.close()
+            raise ValueError("{} is not a component table".format(filename))
+        magic, width, height, kinds, size, components = COMPONENT_HEADER.unpack_from(self.map)
+        try:
+            check_table_geometry(filename, width, height, kinds, geometry)
+        except ValueError:
+            self.close()
+            raise
+        start = COMPONENT_HEADER.size
+        self.counts = list(self.map[start:start + kinds])
+        self.size = size
+        self.components = components
+        start += (kinds + 7) // 8 * 8
+        view = memoryview(self.map)
+        for typecode, length in (('Q', size), ('Q', components), ('I', size), ('I', components),
+                                 ('H', components)):
+            end = start + array(typecode).itemsize * length
+            self.views.append(view[start:end].cast(typecode))
+            start = end
+        self.keys, self.hardest_keys, self.labels, self.sizes, self.depths = self.views
+
+    def component(self, state, geometry=STANDARD):
+        """
+        The component of a layout, or None if it is not a layout of this piece set.
+        """
+        key = db_key(state, geometry)
+        i = bisect.bisect_left(self.keys, key)
+        if i < self.size and self.keys[i] == key:
+            return self.labels[i]
+        return None
+
+    def solvable(self, state, geometry=STANDARD):
+        """
+        False if the table proves that no goal layout can be reached from
+        state. Boards of other piece sets are outside what the table knows,
+        so they are True and left for a search to decide.
+        """
+        if bit_counts(state, geometry) != self.counts:
+            return True
+        component = self.component(state, geometry)
+        if component is None:
+            raise ValueError("the board is not a valid layout of its piece set")
+        return self.depths[component] != NO_GOAL
+
+    def hardest(self, component, geometry=STANDARD):
+        """
+        The layout of a component farthest from a goal, and its distance,
+        or None if the component holds no goal.
+        """
+        if self.depths[component] == NO_GOAL:
+            return None
+        return db_state(self.hardest_keys[component], geometry), self.depths[component]
+
+    def close(self):
+        for view in self.views:
+            view.release()
+        self.map.close()
+        self.file.close()
+
+
+def component_report(table, count=10, geometry=STANDARD):
+    """
+    Describe a component table: how many layouts and components it holds,
+    the largest components and the count hardest start positions.
+
+    :rtype: str
+    """
+    solvable = [c for c in range(table.components) if table.depths[c] != NO_GOAL]
+    lines = ["{} layouts in {} components; {} components holding {} layouts can reach a goal".format(
+        table.size, table.components, len(solvable), sum(table.sizes[c] for c in solvable))]
+    lines.append("largest components:")
+    for c in sorted(range(table.components), key=lambda c: -table.sizes[c])[:count]:
+        reach = "unsolvable" if table.depths[c] == NO_GOAL else "hardest start {} moves".format(table.depths[c])
+        lines.append("  component {}: {} layouts, {}".format(c, table.sizes[c], reach))
+    lines.append("hardest start positions:")
+    for c in sorted(solvable, key=lambda c: -table.depths[c])[:count]:
+        state, d = table.hardest(c, geometry)
+        lines.append("  {} moves (component {} of {} layouts)".format(d, c, table.sizes[c]))
+        lines.append(bit_text(state, geometry))
+    return "\n".join(lines)
+
+
+#====================================================================================
+# Solution cache
+
+# version 2 records the board its codes are for
+CACHE_VERSION = 2
+
+# "HRDS" in the SQLite header of every cache file, so no other file is changed
+CACHE_APPLICATION_ID = 0x48524453
+
+
+class SolutionCache:
+    """
+    Solved boards in an SQLite file, each keyed by its canonical board code
+    with the next board and the moves left, least recently used evicted first.
+    """
+
+    def __init__(self, filename, capacity=1000000, geometry=STANDARD):
+        """
+        :param filename: The SQLite file; created if missing or empty.
+        :type filename: str
+        :param capacity: The most boards kept.
+        :type capacity: int
+        :raises ValueError: If filename is some other file, or a cache for
+            another board
+        """
+        self.geometry = geometry
+        self.capacity = capacity
+        self.key_bytes = code_width(geometry)
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(filename, timeout=60, check_same_thread=False)
+        # the threads of one service share the connection
+        self.lock = threading.Lock()
+        try:
+            application_id = self.connection.execute("PRAGMA application_id").fetchone()[0]
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            tables = self.connection.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0]
+        except sqlite3.DatabaseError:
+            application_id = None
+        if application_id == 0 and tables == 0:
+            self.connection.execute("PRAGMA application_id = {}".format(CACHE_APPLICATION_ID))
+        elif application_id != CACHE_APPLICATION_ID or version > CACHE_VERSION:
+            self.connection.close()
+            raise ValueError("{} is not a solution cache".format(filename))
+        if application_id == 0 or version < CACHE_VERSION:
+            # only a cache of an older version is ever emptied
+            self.connection.execute("DROP TABLE IF EXISTS boards")
+            self.connection.execute("DROP TABLE IF EXISTS board")
+            self.connection.execute("PRAGMA user_version = {}".format(CACHE_VERSION))
+        # a board code only means something on the board it was made for
+        board = json.dumps([geometry.width, geometry.height, geometry.goal, geometry.glyphs])
+        self.connection.execute("CREATE TABLE IF NOT EXISTS board (spec TEXT)")
+        row = self.connection.execute("SELECT spec FROM board").fetchone()
+        if row is None:
+            self.connection.execute("INSERT INTO board VALUES (?)", (board,))
+        elif row[0] != board:
+            self.connection.close()
+            raise ValueError("{} is a solution cache for another board".format(filename))
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS boards (key BLOB PRIMARY KEY, next BLOB, "
+            "remaining INTEGER, optimal INTEGER, used INTEGER)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS boards_used ON boards (used)")
+        self.connection.commit()
+        self.clock = self.connection.execute("SELECT MAX(used) FROM boards").fetchone()[0] or 0
+
+    def __oriented(self, state):
+        # the key of state's canonical layout and whether state is its mirror image
+        canonical = self.geometry.canonical(state)
+        return encode_board(canonical, self.geometry).to_bytes(self.key_bytes, 'big'), canonical != state
+
+    def lookup(self, start, optimal=True):
+        """
+        The stored path from start to a goal, or None on a miss.
+
+        :param start: The packed initial state.
+        :type start: int
+        :param optimal: Only accept paths stored by an optimal search.
+        :type optimal: bool
+        :rtype: Optional[List[int]]
+        """
+        with self.lock:
+            return self.__lookup(start, optimal)
+
+    def __lookup(self, start, optimal):
+        path = [start]
+        keys = []
+        remaining = None
+        while remaining != 0:
+            key, mirrored = self.__oriented(path[-1])
+            row = self.connection.execute(
+                "SELECT next, remaining, optimal FROM boards WHERE key = ?", (key,)).fetchone()
+            # a broken chain (evicted board) or a worse entry counts as a miss
+            if row is None or (optimal and not row[2]) or \
+                    (remaining is not None and row[1] != remaining - 1):
+                self.misses += 1
+                return None
+            keys.append(key)
+            remaining = row[1]
+            if remaining:
+                nxt = decode_board(int.from_bytes(row[0], 'big'), self.geometry)
+                path.append(self.geometry.mirror(nxt) if mirrored else nxt)
+        self.hits += 1
+        self.clock += 1
+        self.connection.executemany("UPDATE boards SET used = ? WHERE key = ?",
+                                    [(self.clock, key) for key in keys])
+        self.connection.commit()
+        return path
+
+    def store(self, path, optimal=True):
+        """
+        Record every board of a solution path with the rest of the path.
+        A board keeps its old entry when that entry is at least as good.
+
+        :param path: The packed states from a start to a goal.
+        :type path: List[int]
+        :param optimal: True if path came from an optimal search.
+        :type optimal: bool
+        """
+        with self.lock:
+            self.__store(path, optimal)
+
+    def __store(self, path, optimal):
+        self.clock += 1
+        for i, state in enumerate(path):
+            key, mirrored = self.__oriented(state)
+            nxt = path[i + 1] if i + 1 < len(path) else 0
+            if mirrored:
+                nxt = self.geometry.mirror(nxt)
+            nxt = encode_board(nxt, self.geometry)
+            remaining = len(path) - 1 - i
+            row = self.connection.execute(
+                "SELECT remaining, optimal FROM boards WHERE key = ?", (key,)).fetchone()
+            if row is not None and (row[1] > optimal or (row[1] == optimal and row[0] <= remaining)):
+                self.connection.execute("UPDATE boards SET used = ? WHERE key = ?", (self.clock, key))
+                continue
+            self.connection.execute(
+                "INSERT OR REPLACE INTO boards VALUES (?, ?, ?, ?, ?)",
+                (key, nxt.to_bytes(self.key_bytes, 'big'), remaining, int(optimal), self.clock))
+        self.connection.execute(
+            "DELETE FROM boards WHERE key IN (SELECT key FROM boards ORDER BY used LIMIT "
+            "MAX((SELECT COUNT(*) FROM boards) - ?, 0))", (self.capacity,))
+        self.connection.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM boards").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+#====================================================================================
+# Solving boards outside of __main__
+
+ALGORITHMS = ('astar', 'dfs', 'bibfs', 'idastar', 'db', 'hda', 'vbfs', 'anytime', 'external')
+
+# the algorithms that use --symmetry and --heuristic; the others would ignore them
+SYMMETRY_ALGORITHMS = ('astar', 'dfs')
+HEURISTIC_ALGORITHMS = ('astar', 'idastar', 'hda', 'anytime')
+
+# variants, pattern databases, distance tables and solution caches are built
+# or opened once per process, under open_lock for the threads of a service
+open_lock = threading.RLock()
+geometry_cache = {}
+heuristic_cache = {}
+pattern_tables = {}
+hint_sessions = {}
+table_cache = {}
+component_tables = {}
+solution_caches = {}
+
+
+def check_options(algo, heuristic="manhattan", symmetry=False):
+    """
+    Raise ValueError if algo would ignore the heuristic or symmetry asked for.
+    """
+    if symmetry and algo not in SYMMETRY_ALGORITHMS:
+        raise ValueError("symmetry is only used by {}, not {}".format(" and ".join(SYMMETRY_ALGORITHMS), algo))
+    if heuristic != "manhattan" and algo not in HEURISTIC_ALGORITHMS:
+        raise ValueError("the {} heuristic is only used by {}, not {}".format(
+            heuristic, ", ".join(HEURISTIC_ALGORITHMS), algo))
+
+
+def open_geometry(filename):
+    """
+    The Geometry of a variant file, or STANDARD for None; loaded once per process.
+    """
+    if filename is None:
+        return STANDARD
+    with open_lock:
+        if filename not in geometry_cache:
+            geometry_cache[filename] = load_geometry(filename)
+        return geometry_cache[filename]
+
+
+def make_heuristic(name, start, geometry=STANDARD, pdb=None):
+    """
+    The heuristic called name ('manhattan' or 'pdb') for the piece set of start.
+    A pattern file pdb is used when it was built for that piece set; the
+    tables are built in memory otherwise.
+    """
+    if name == "pdb":
+        if pdb is not None:
+            table = open_patterns(pdb, geometry)
+            if table.counts == bit_counts(start, geometry):
+                return table
+        key = (geometry, tuple(bit_counts(start, geometry)))
+        with open_lock:
+            if key not in heuristic_cache:
+                heuristic_cache[key] = PatternDatabase(key[1], geometry)
+            return heuristic_cache[key]
+    return bit_manhattan
+
+
+def open_patterns(filename, geometry=STANDARD):
+    """
+    A PatternTable for filename on a geometry, opened once per process.
+    """
+    key = (filename, geometry)
+    with open_lock:
+        if key not in pattern_tables:
+            pattern_tables[key] = PatternTable(filename, geometry)
+        return pattern_tables[key]
+
+
+def open_table(filename, geometry=STANDARD):
+    """
+    A DistanceTable for filename on a geometry, opened once per process.
+    """
+    key = (filename, geometry)
+    with open_lock:
+        if key not in table_cache:
+            table_cache[key] = DistanceTable(filename, geometry)
+        return table_cache[key]
+
+
+def open_hints(geometry=STANDARD, heuristic="manhattan", pdb=None):
+    """
+    A HintSession for a geometry and heuristic, kept for the whole process.
+    """
+    key = (geometry, heuristic, pdb)
+    with open_lock:
+        if key not in hint_sessions:
+            hint_sessions[key] = HintSession(geometry, heuristic, pdb=pdb)
+        return hint_sessions[key]
+
+
+def open_components(filename, geometry=STANDARD):
+    """
+    A ComponentTable for filename on a geometry, opened once per process.
+    """
+    key = (filename, geometry)
+    with open_lock:
+        if key not in component_tables:
+            component_tables[key] = ComponentTable(filename, geometry)
+        return component_tables[key]
+
+
+def open_cache(filename, capacity=1000000, geometry=STANDARD):
+    """
+    A SolutionCache for filename on a geometry, opened once per process.
+    """
+    key = (filename, geometry)
+    with open_lock:
+        if key not in solution_caches:
+            solution_caches[key] = SolutionCache(filename, capacity, geometry)
+        return solution_caches[key]
+
+
+def solve(start, algo, heuristic="manhattan", symmetry=False, tt_size=1 << 20, db=None,
+          stats=None, geometry=STANDARD, cache=None, workers=None, time_budget=None,
+          on_solution=None, memory=1 << 20, spill_dir=None, components=None, pdb=None):
+    """
+    Run one of the packed searches on start.
+
+    :param start: The packed initial state.
+    :type start: int
+    :param algo: One of ALGORITHMS.
+    :type algo: str
+    :param heuristic: 'manhattan' or 'pdb', for astar, idastar, hda and anytime.
+    :type heuristic: str
+    :param symmetry: Mirror-reduce visited keys, for astar and dfs.
+    :type symmetry: bool
+    :param tt_size: Transposition table slots, for idastar.
+    :type tt_size: int
+    :param db: Distance database file, for db.
+    :type db: Optional[str]
+    :param stats: Counters to fill in, if any.
+    :type stats: Optional[SearchStats]
+    :param cache: Checked before searching and given every new solution.
+        dfs and anytime accept any cached path; the other algorithms only optimal ones.
+    :type cache: Optional[SolutionCache]
+    :param workers: Worker processes, for hda.
+    :type workers: Optional[int]
+    :param time_budget: Seconds to improve the path for, for anytime.
+    :type time_budget: Optional[float]
+    :param on_solution: Called as on_solution(path, bound) with each better
+        path, for anytime.
+    :type on_solution: Optional[Callable[[List[int], float], None]]
+    :param memory: Successors held in memory before they are spilled, for external.
+    :type memory: int
+    :param spill_dir: Directory for the spill files of external.
+    :type spill_dir: Optional[str]
+    :param components: Component table file; start is rejected at once if
+        its component holds no goal. Boards of other piece sets are searched.
+    :type components: Optional[str]
+    :param pdb: Pattern file for the pdb heuristic, used when it was built
+        for the piece set of start.
+    :type pdb: Optional[str]
+    :return: The packed states from start to a goal, or None if there is none
+    :rtype: Optional[List[int]]
+    :raises ValueError: If algo does not use the heuristic or symmetry given
+    """
+    check_options(algo, heuristic, symmetry)
+    if components is not None and not open_components(components, geometry).solvable(start, geometry):
+        return None
+    options = {"workers": workers, "time_budget": time_budget, "on_solution": on_solution,
+               "memory": memory, "spill_dir": spill_dir, "pdb": pdb}
+    if cache is None:
+        return search(start, algo, heuristic, symmetry, tt_size, db, stats, geometry, **options)
+    optimal = algo not in ("dfs", "anytime")
+    path = cache.lookup(start, optimal)
+    if path is None:
+        path = search(start, algo, heuristic, symmetry, tt_size, db, stats, geometry, **options)
+        if path is not None:
+            cache.store(path, optimal)
+    return path
+
+
+def search(start, algo, heuristic, symmetry, tt_size, db, stats, geometry, workers=None,
+           time_budget=None, on_solution=None, memory=1 << 20, spill_dir=None, pdb=None):
+    """
+    The uncached part of solve.
+    """
+    if algo == "dfs":
+        return bit_dfs(start, geometry, symmetry, stats)
+    if algo == "astar":
+        return bit_astar(start, geometry, symmetry, make_heuristic(heuristic, start, geometry, pdb),
+                         stats)
+    if algo == "idastar":
+        return bit_idastar(start, geometry, make_heuristic(heuristic, start, geometry, pdb), tt_size, stats)
+    if algo == "bibfs":
+        return bit_bibfs(start, geometry, stats)
+    if algo == "db":
+        return db_solve(start, open_table(db, geometry), geometry, stats)
+    if algo == "hda":
+        return bit_hda(start, geometry, heuristic, workers, stats, pdb)
+    if algo == "vbfs":
+        return bit_vbfs(start, geometry, stats)
+    if algo == "anytime":
+        # the budget covers building the heuristic too
+        deadline = None if time_budget is None else time.time() + time_budget
+        return bit_anytime(start, geometry, make_heuristic(heuristic, start, geometry, pdb), time_budget,
+                           on_solution=on_solution, stats=stats, deadline=deadline)
+    if algo == "external":
+        return bit_external(start, geometry, memory, spill_dir, stats)
+    raise ValueError("unknown algorithm {}".format(algo))
+
+
+def bit_text(state, geometry=STANDARD):
+    """
+    The text grid of a packed state, one line per row, drawn straight from
+    the bits without building a Board.
+    """
+    width = geometry.width
+    cells = ['.'] * geometry.cells
+    for kind, glyphs in enumerate(geometry.glyphs):
+        field = geometry.field(state, kind)
+        while field:
+            low = field & -field
+            field ^= low
+            anchor = low.bit_length() - 1
+            for (dx, dy), ch in glyphs:
+                cells[anchor + dy * width + dx] = ch
+    return ''.join(''.join(cells[row:row + width]) + "\n" for row in range(0, geometry.cells, width))
+
+
+def bit_move(state, child, geometry=STANDARD):
+    """
+    The move that turns state into child, one of its successors.
+
+    :return: The kind of the moved piece, the (x, y) of its anchor before
+        the move and the direction
+    :rtype: Tuple[int, int, int, str]
+    """
+    src = (state & ~child).bit_length() - 1
+    dst = (child & ~state).bit_length() - 1
+    kind, cell = divmod(src, geometry.cells)
+    step = dst - src
+    if step == 1:
+        direction = "right"
+    elif step == -1:
+        direction = "left"
+    elif step > 0:
+        direction = "down"
+    else:
+        direction = "up"
+    return kind, cell % geometry.width, cell // geometry.width, direction
+
+
+def write_path(filename, path, geometry=STANDARD, format="grids"):
+    """
+    Write packed states to a given file.
+
+    In the "grids" format every board is written as its text grid followed
+    by a blank line, as write_file always did. In the "moves" format only the
+    start board is written that way, followed by one line per move: the
+    anchor glyph of the moved piece, the x and y of its anchor before the
+    move and the direction, e.g. "^ 0 2 down". replay_moves turns a moves
+    file back into grids. Both formats are written as path is consumed, so
+    path may be any iterable. The "packed" format is binary, see
+    write_packed.
+
+    :param filename: The name of the given file.
+    :type filename: str
+    :param path: The packed states from the start to a goal.
+    :type path: Iterable[int]
+    :param format: "grids", "moves" or "packed".
+    :type format: str
+    """
+    if format == "packed":
+        write_packed(filename, list(path), geometry)
+        return
+    sol_file = open(filename, "w", buffering=1 << 16)
+    if format == "moves":
+        write_moves(sol_file, path, geometry)
+    else:
+        write_grids(sol_file, path, geometry)
+    sol_file.close()
+
+
+def write_grids(sol_file, path, geometry=STANDARD):
+    """
+    Write the text grid of every packed state in path, in chunks of boards.
+    """
+    chunk = []
+    for state in path:
+        chunk.append(bit_text(state, geometry) + "\n")
+        if len(chunk) == 1024:
+            sol_file.write(''.join(chunk))
+            chunk = []
+    sol_file.write(''.join(chunk))
+
+
+def write_moves(sol_file, path, geometry=STANDARD):
+    """
+    Write the start board of path and then one line per move.
+    """
+    previous = None
+    for state in path:
+        if previous is None:
+            sol_file.write(bit_text(state, geometry) + "\n")
+        else:
+            sol_file.write(move_text(previous, state, geometry) + "\n")
+        previous = state
+
+
+def move_text(state, child, geometry=STANDARD):
+    """
+    The move from state to child as written in the "moves" format.
+    """
+    kind, x, y, direction = bit_move(state, child, geometry)
+    return "{} {} {} {}".format(geometry.glyphs[kind][0][1], x, y, direction)
+
+
+def replay_moves(filename, geometry=STANDARD):
+    """
+    Read a file written in the "moves" format and yield every packed state
+    of its path, checking that each move is legal.
+
+    :param filename: The name of the given file.
+    :type filename: str
+    :rtype: Iterator[int]
+    :raises ValueError: At the first line that is not a legal move
+    """
+    steps = {"left": -1, "right": 1, "up": -geometry.width, "down": geometry.width}
+    with open(filename, "r") as moves_file:
+        lines = []
+        for line in moves_file:
+            if not line.strip():
+                break
+            lines.append(line.rstrip("\n"))
+        state = parse_bits(lines, geometry)
+        yield state
+        for number, line in enumerate(moves_file, len(lines) + 2):
+            if not line.strip():
+                continue
+            fields = line.split()
+            if len(fields) != 4:
+                raise ValueError("line {}: expected glyph x y direction, found {!r}".format(number, line.strip()))
+            glyph, x, y, direction = fields
+            if direction not in steps:
+                raise ValueError("line {}: unknown direction {!r}".format(number, direction))
+            if not (x.isdigit() and y.isdigit() and int(x) < geometry.width and int(y) < geometry.height):
+                raise ValueError("line {}: ({}, {}) is not a cell of the board".format(number, x, y))
+            cell = int(y) * geometry.width + int(x)
+            for kind in range(geometry.kinds):
+                if (state >> (kind * geometry.cells + cell)) & 1:
+                    break
+            else:
+                raise ValueError("line {}: no piece is anchored at ({}, {})".format(number, x, y))
+            if glyph != geometry.glyphs[kind][0][1]:
+                raise ValueError("line {}: the piece anchored at ({}, {}) is {}, not {}".format(
+                    number, x, y, geometry.glyphs[kind][0][1], glyph))
+            child = state ^ (1 << (kind * geometry.cells + cell)) \
+                ^ (1 << (kind * geometry.cells + cell + steps[direction]))
+            if child not in bit_successors(state, geometry):
+                raise ValueError("line {}: illegal move {}".format(number, line.strip()))
+            state = child
+            yield state
+
+
+#====================================================================================
+# Board codes
+#
+# A board code is a compact, canonical number for a layout. Walking the
+# cells in reading order and skipping the cells covered by pieces already
+# seen, every cell reached is either a blank or the anchor of a piece, so
+# the layout is the sequence of those choices: 0 for a blank, kind + 1 for
+# an anchor. The code holds that sequence as the digits of a base kinds + 1
+# number, first cell lowest, and fits in code_width(geometry) bytes: 6 on
+# the standard board, against 10 for a packed state and 25 for a text grid.
+# Equal layouts always get equal codes.
+
+PACKED_MAGIC = b'HRDP'
+PACKED_HEADER = struct.Struct('=4sBBBBI')
+
+
+def code_width(geometry=STANDARD):
+    """
+    The bytes needed for any board code of a geometry.
+    """
+    return (((geometry.kinds + 1) ** geometry.cells - 1).bit_length() + 7) // 8
+
+
+def encode_board(state, geometry=STANDARD):
+    """
+    The board code of a packed state; use board_to_bits first for a Board.
+
+    :rtype: int
+    """
+    cells = geometry.cells
+    full = geometry.full
+    base = geometry.kinds + 1
+    fields = [(state >> (kind * cells)) & full for kind in range(geometry.kinds)]
+    # the cells the walk reaches: blanks and anchors
+    reached = geometry.empty(state)
+    for field in fields:
+        reached |= field
+    # an anchor is the digit at its rank among the reached cells; blanks add 0
+    code = 0
+    for symbol, field in enumerate(fields, 1):
+        while field:
+            low = field & -field
+            field ^= low
+            code += symbol * base ** bin(reached & (low - 1)).count("1")
+    return code
+
+
+def decode_board(code, geometry=STANDARD):
+    """
+    Inverse of encode_board.
+
+    :rtype: int
+    :raises ValueError: If code is not the code of a layout
+    """
+    cells = geometry.cells
+    base = geometry.kinds + 1
+    full = geometry.full
+    original = code
+    state = 0
+    claimed = 0
+    while claimed != full:
+        code, symbol = divmod(code, base)
+        # the first cell, in reading order, that no piece or blank has claimed
+        low = ~claimed & (claimed + 1)
+        if not symbol:
+            claimed |= low
+            continue
+        cell = low.bit_length() - 1
+        cover = geometry.covers[symbol - 1][cell]
+        if cover is None or claimed & cover:
+            raise ValueError("{} is not a board code".format(original))
+        state |= 1 << ((symbol - 1) * cells + cell)
+        claimed |= cover
+    if code:
+        raise ValueError("{} is not a board code".format(original))
+    return state
+
+
+def encode_boards(states, geometry=STANDARD):
+    """
+    The board codes of many packed states as one array of fixed width,
+    big endian records, for files and messages between processes.
+
+    :type states: Iterable[int]
+    :rtype: bytes
+    """
+    width = code_width(geometry)
+    return b"".join(encode_board(state, geometry).to_bytes(width, 'big') for state in states)
+
+
+def decode_boards(data, geometry=STANDARD):
+    """
+    Inverse of encode_boards.
+
+    :param data: The records, such as bytes, a memoryview or an mmap.
+    :type data: Buffer
+    :rtype: List[int]
+    """
+    width = code_width(geometry)
+    if len(data) % width:
+        raise ValueError("{} bytes are not a whole number of {} byte board codes".format(len(data), width))
+    return [decode_board(int.from_bytes(data[i:i + width], 'big'), geometry)
+            for i in range(0, len(data), width)]
+
+
+def write_packed(filename, path, geometry=STANDARD):
+    """
+    Write a solution path in the "packed" format: a PACKED_HEADER of the
+    magic, board width, height, number of kinds, code width and number of
+    boards, followed by the board codes from encode_boards.
+
+    :param path: The packed states from the start to a goal.
+    :type path: List[int]
+    """
+    sol_file = open(filename, "wb")
+    sol_file.write(PACKED_HEADER.pack(PACKED_MAGIC, geometry.width, geometry.height, geometry.kinds,
+                                      code_width(geometry), len(path)))
+    sol_file.write(encode_boards(path, geometry))
+    sol_file.close()
+
+
+def read_packed(filename, geometry=STANDARD):
+    """
+    The packed states of a file written by write_packed.
+
+    :rtype: List[int]
+    """
+    sol_file = open(filename, "rb")
+    data = sol_file.read()
+    sol_file.close()
+    if data[:4] != PACKED_MAGIC:
+        raise ValueError("{} is not a packed solution file".format(filename))
+    magic, width, height, kinds, code_bytes, count = PACKED_HEADER.unpack_from(data)
+    if (width, height, kinds, code_bytes) != (geometry.width, geometry.height, geometry.kinds,
+                                              code_width(geometry)):
+        raise ValueError("{} was written for a different board".format(filename))
+    path = decode_boards(memoryview(data)[PACKED_HEADER.size:], geometry)
+    if len(path) != count:
+        raise ValueError("{} holds {} boards, not {}".format(filename, len(path), count))
+    return path
+
+
+def replay_packed(filename, geometry=STANDARD):
+    """
+    Yield every packed state of a packed solution file, checking that each
+    follows from the one before by a legal move.
+
+    :rtype: Iterator[int]
+    """
+    previous = None
+    for number, state in enumerate(read_packed(filename, geometry)):
+        if previous is not None and state not in bit_successors(previous, geometry):
+            raise ValueError("board {}: not one move from the board before".format(number))
+        previous = state
+        yield state
+
+
+#====================================================================================
+# Puzzle containers
+#
+# A container holds many puzzles in one file, or on stdin, as the text grids
+# of puzzle files separated by blank lines; lines starting with # are
+# comments. Boards are read one at a time and packed straight from their
+# text, so a corpus of any size streams through without a file per puzzle
+# or a Board per puzzle.
+
+class BoardError(ValueError):
+    """
+    Raised for text that does not draw a valid board of its geometry.
+    """
+
+    def __init__(self, line, message):
+        super().__init__("line {}: {}".format(line, message))
+        self.line = line
+
+
+def parse_bits(lines, geometry=STANDARD, first_line=1):
+    """
+    Pack the rows of a text grid into a state, checking that they draw a
+    valid board: height rows of width cells, every cell a blank or part of a
+    whole piece, exactly one goal piece and at least one blank.
+
+    :param lines: The rows of the grid; trailing whitespace is ignored.
+    :type lines: List[str]
+    :param first_line: The line number of the first row, for errors.
+    :type first_line: int
+    :return: The packed state
+    :rtype: int
+    :raises BoardError: If the rows are not a valid board
+    """
+    width = geometry.width
+    lines = [line.rstrip() for line in lines]
+    if len(lines) != geometry.height:
+        raise BoardError(first_line, "expected {} rows, found {}".format(geometry.height, len(lines)))
+    for number, line in enumerate(lines, first_line):
+        if len(line) != width:
+            raise BoardError(number, "expected {} cells, found {!r}".format(width, line))
+    grid = "".join(lines)
+    state = 0
+    claimed = 0
+    blanks = 0
+    for cell, ch in enumerate(grid):
+        if (claimed >> cell) & 1:
+            continue
+        if ch == char_blank:
+            blanks += 1
+            continue
+        # a piece starts at its anchor, the first of its cells in reading order
+        for kind, cover, drawn in geometry.placements[cell].get(ch, ()):
+            if not claimed & cover and all(grid[other] == glyph for other, glyph in drawn):
+                state |= 1 << (kind * geometry.cells + cell)
+                claimed |= cover
+                break
+        else:
+            raise BoardError(first_line + cell // width, "{!r} at ({}, {}) is not part of a whole piece"
+                             .format(ch, cell % width, cell // width))
+    goals = bin(geometry.field(state, KIND_GOAL)).count("1")
+    if goals != 1:
+        raise BoardError(first_line, "expected one goal piece, found {}".format(goals))
+    if not blanks:
+        raise BoardError(first_line, "no blank cell, so no piece can move")
+    return state
+
+
+def board_blocks(stream):
+    """
+    The rows of every puzzle of a container, read lazily.
+
+    :param stream: The container, as an iterable of lines.
+    :type stream: Iterable[str]
+    :return: (line number of the first row, rows) for every puzzle
+    :rtype: Iterator[Tuple[int, List[str]]]
+    """
+    rows = []
+    first_line = 0
+    for number, line in enumerate(stream, 1):
+        line = line.rstrip()
+        if line.startswith("#"):
+            continue
+        if line:
+            if not rows:
+                first_line = number
+            rows.append(line)
+        elif rows:
+            yield first_line, rows
+            rows = []
+    if rows:
+        yield first_line, rows
+
+
+def read_boards(stream, geometry=STANDARD):
+    """
+    The packed states of every puzzle of a container, read lazily.
+
+    :param stream: The container, as an iterable of lines.
+    :type stream: Iterable[str]
+    :return: (line number of the first row, packed state) for every puzzle
+    :rtype: Iterator[Tuple[int, int]]
+    :raises BoardError: At the first puzzle that is not a valid board
+    """
+    for first_line, rows in board_blocks(stream):
+        yield first_line, parse_bits(rows, geometry, first_line)
+
+
+def container_inputs(filename):
+    """
+    The puzzles of a container file, or of stdin if filename is '-', as
+    (source, line number of the first row, rows) for run_batch.
+
+    :rtype: Iterator[Tuple[str, int, List[str]]]
+    """
+    if filename == "-":
+        for first_line, rows in board_blocks(sys.stdin):
+            yield "stdin", first_line, rows
+        return
+    container = open(filename, "r")
+    try:
+        for first_line, rows in board_blocks(container):
+            yield filename, first_line, rows
+    finally:
+        container.close()
+
+
+#====================================================================================
+# Batch solving
+
+class SearchTimeout(Exception):
+    """
+    Raised inside a batch worker when a puzzle runs past its time limit.
+    """
+
+
+def batch_inputs(spec):
+    """
+    The puzzle files named by spec: every .txt file of a directory, the
+    matches of a glob pattern, or the lines of a manifest file (relative
+    paths are taken from the manifest's directory; blank lines and lines
+    starting with # are skipped).
+
+    :rtype: List[str]
+    """
+    if os.path.isdir(spec):
+        return sorted(glob.glob(os.path.join(spec, "*.txt")))
+    if glob.has_magic(spec):
+        return sorted(glob.glob(spec))
+    base = os.path.dirname(spec)
+    manifest = open(spec, "r")
+    inputs = [os.path.join(base, line.strip()) for line in manifest
+              if line.strip() and not line.startswith("#")]
+    manifest.close()
+    return inputs
+
+
+def batch_alarm(signum, frame):
+    raise SearchTimeout()
+
+
+def batch_worker_init():
+    signal.signal(signal.SIGALRM, batch_alarm)
+
+
+def puzzle_label(puzzle):
+    """
+    How a batch puzzle is named in the summary: its file, or source:line
+    for a puzzle of a container.
+    """
+    if isinstance(puzzle, str):
+        return puzzle
+    return "{}:{}".format(puzzle[0], puzzle[1])
+
+
+def puzzle_name(puzzle):
+    """
+    The base name of the solution file of a batch puzzle.
+    """
+    if isinstance(puzzle, str):
+        return os.path.splitext(os.path.basename(puzzle))[0]
+    return "{}_{}".format(os.path.splitext(os.path.basename(puzzle[0]))[0], puzzle[1])
+
+
+def batch_solve(puzzle, outputfile, algo, options, timeout):
+    """
+    Solve one puzzle in a batch worker and write its solution.
+
+    :param puzzle: A puzzle file, or (source, first line, rows) for a puzzle
+        of a container.
+    :type puzzle: Union[str, Tuple[str, int, List[str]]]
+    :param options: Keyword arguments for solve.
+    :type options: dict
+    :param timeout: Seconds allowed for the search, or None for no limit.
+    :type timeout: Optional[float]
+    :return: One summary row: puzzle, status, moves, seconds, nodes, solution file
+    :rtype: List
+    """
+    started = time.time()
+    stats = SearchStats()
+    options = dict(options)
+    options["geometry"] = geometry = open_geometry(options.pop("variant", None))
+    format = options.pop("format", "grids")
+    cache_size = options.pop("cache_size", 1000000)
+    inputfile = puzzle_label(puzzle)
+    try:
+        if options.get("cache"):
+            options["cache"] = open_cache(options["cache"], cache_size, geometry)
+        if isinstance(puzzle, str):
+            start = board_to_bits(read_from_file(puzzle, geometry), geometry)
+        else:
+            start = parse_bits(puzzle[2], geometry, puzzle[1])
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            path = solve(start, algo, stats=stats, **options)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    except SearchTimeout:
+        return [inputfile, "timeout", "", round(time.time() - started, 6), stats.expanded, ""]
+    except Exception as e:
+        return [inputfile, "error: {}".format(e), "", round(time.time() - started, 6), stats.expanded, ""]
+    if path is None:
+        return [inputfile, "unsolvable", "", round(time.time() - started, 6), stats.expanded, ""]
+    write_path(outputfile, path, geometry, format)
+    return [inputfile, "solved", len(path) - 1, round(time.time() - started, 6), stats.expanded, outputfile]
+
+
+def run_batch(inputs, outputdir, algo, options, summary, workers=None, max_in_flight=None,
+              timeout=None):
+    """
+    Solve many puzzles across a pool of worker processes. At most
+    max_in_flight puzzles are queued or running at once, and each summary
+    row is written to the CSV file summary as soon as its puzzle finishes.
+    If a worker dies, the puzzles in flight are reported as errors and the
+    pool is started again for the rest.
+
+    :param inputs: The puzzles, as batch_solve takes them; read lazily.
+    :type inputs: Iterable[Union[str, Tuple[str, int, List[str]]]]
+    :param outputdir: Where each <name>_sol.txt solution is written.
+    :type outputdir: str
+    :param options: Keyword arguments for solve.
+    :type options: dict
+    :param summary: The summary CSV file.
+    :type summary: str
+    :param workers: Worker processes; defaults to the number of CPUs.
+    :type workers: Optional[int]
+    :param max_in_flight: Puzzles submitted but not finished; defaults to
+        twice the number of workers.
+    :type max_in_flight: Optional[int]
+    :param timeout: Seconds allowed per puzzle, or None for no limit.
+    :type timeout: Optional[float]
+    :return: The number of puzzles solved and the number attempted
+    :rtype: Tuple[int, int]
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or 2 * workers
+    os.makedirs(outputdir, exist_ok=True)
+    summary_file = open(summary, "w", newline="")
+    writer = csv.writer(summary_file)
+    writer.writerow(["puzzle", "status", "moves", "seconds", "nodes", "solution"])
+    solved = 0
+    attempted = 0
+    pending = {}
+    remaining = iter(inputs)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=batch_worker_init)
+    try:
+        while True:
+            for puzzle in remaining:
+                outputfile = os.path.join(outputdir, puzzle_name(puzzle) + "_sol.txt")
+                future = pool.submit(batch_solve, puzzle, outputfile, algo, options, timeout)
+                pending[future] = puzzle
+                attempted += 1
+                if len(pending) >= max_in_flight:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = False
+            while done:
+                for future in done:
+                    puzzle = pending.pop(future)
+                    try:
+                        row = future.result()
+                    except BrokenProcessPool:
+                        row = [puzzle_label(puzzle), "error: worker process died", "", "", "", ""]
+                        broken = True
+                    solved += row[1] == "solved"
+                    writer.writerow(row)
+                # every puzzle still in flight fails with the broken pool
+                done = wait(pending)[0] if broken else ()
+            summary_file.flush()
+            if broken:
+                pool.shutdown()
+                pool = ProcessPoolExecutor(max_workers=workers, initializer=batch_worker_init)
+    finally:
+        pool.shutdown()
+    summary_file.close()
+    return solved, attempted
+
+
+#====================================================================================
+# Benchmarks
+#
+# The corpus is drawn from the backward breadth first search of each piece
+# set, so every puzzle can reach a goal and is labelled with its exact
+# optimal depth. The same seed always gives the same corpus.
+
+# name, shallowest and deepest optimal depth of each difficulty bucket
+BENCH_BUCKETS = (("easy", 1, 30), ("medium", 31, 80), ("hard", 81, 1 << 16))
+
+# algorithms whose searches run in other processes, out of tracemalloc's sight
+BENCH_UNTRACED = ("hda",)
+
+# how many times the timeout a run repeated under tracemalloc may take
+BENCH_TRACE_SLOWDOWN = 5
+
+# the piece sets of testhrd_easy1, testhrd_med1 and testhrd_hard1
+BENCH_PIECE_SETS = ([1, 2, 3, 4], [1, 3, 2, 4], [1, 4, 1, 4])
+
+
+def generate_corpus(piece_sets, per_bucket=5, seed=0, geometry=STANDARD):
+    """
+    Draw puzzles with known optimal depths from every bucket of every piece set.
+
+    :param piece_sets: The number of pieces of each kind, per piece set.
+    :type piece_sets: List[List[int]]
+    :param per_bucket: Puzzles drawn per bucket and piece set; fewer if the
+        bucket holds fewer layouts.
+    :type per_bucket: int
+    :param seed: Seed of the draw.
+    :type seed: int
+    :return: (name, bucket, optimal depth, packed state) of every puzzle
+    :rtype: List[Tuple[str, str, int, int]]
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for counts in piece_sets:
+        distance, depth = goal_distances(counts, geometry)
+        prefix = "p" + "".join(str(count) for count in counts)
+        for bucket, shallowest, deepest in BENCH_BUCKETS:
+            layouts = sorted(state for state, d in distance.items() if shallowest <= d <= deepest)
+            for i, state in enumerate(rng.sample(layouts, min(per_bucket, len(layouts)))):
+                name = "{}-{}-{:03d}".format(prefix, bucket, i)
+                corpus.append((name, bucket, distance[state], state))
+    return corpus
+
+
+def write_corpus(corpus, directory, geometry=STANDARD):
+    """
+    Write every puzzle of a corpus as <name>.txt in directory, with a
+    manifest.txt that --batch accepts and a corpus.csv of optimal depths.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = open(os.path.join(directory, "manifest.txt"), "w")
+    depths = open(os.path.join(directory, "corpus.csv"), "w", newline="")
+    writer = csv.writer(depths)
+    writer.writerow(["puzzle", "bucket", "depth"])
+    for name, bucket, depth, state in corpus:
+        puzzle_file = open(os.path.join(directory, name + ".txt"), "w")
+        puzzle_file.write(bit_text(state, geometry))
+        puzzle_file.close()
+        manifest.write(name + ".txt\n")
+        writer.writerow([name, bucket, depth])
+    manifest.close()
+    depths.close()
+
+
+def bench_run(start, algo, options, timeout, trace=False):
+    """
+    Solve start once, stopping after timeout seconds if given.
+
+    :param trace: Measure the peak memory allocated by the search.
+    :type trace: bool
+    :return: The path or None, the seconds taken, the nodes expanded and
+        the peak bytes allocated (0 unless traced)
+    :rtype: Tuple[Optional[List[int]], float, int, int]
+    """
+    stats = SearchStats()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    if timeout:
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        path = solve(start, algo, stats=stats, **options)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        if trace:
+            tracemalloc.stop()
+    return path, seconds, stats.expanded, peak
+
+
+def run_bench(corpus, algos, options, results, timeout=None):
+    """
+    Run every algorithm on every puzzle of a corpus and write one CSV row
+    per run to results. Each search is timed on its own, then repeated under
+    tracemalloc for its peak memory, so tracing does not skew the times.
+    The traced run may take BENCH_TRACE_SLOWDOWN times the timeout; if it
+    runs out, the peak is left blank and the timed result is kept.
+    tracemalloc only sees this process, so the peak of the algorithms in
+    BENCH_UNTRACED, whose work runs in worker processes, is left blank.
+
+    :param corpus: As from generate_corpus.
+    :type corpus: List[Tuple[str, str, int, int]]
+    :param algos: Names from ALGORITHMS.
+    :type algos: List[str]
+    :param options: Keyword arguments for solve.
+    :type options: dict
+    :param results: The CSV file written.
+    :type results: str
+    :param timeout: Seconds allowed per run, or None for no limit.
+    :type timeout: Optional[float]
+    :return: The number of runs that found an optimal path
+    :rtype: int
+    """
+    signal.signal(signal.SIGALRM, batch_alarm)
+    results_file = open(results, "w", newline="")
+    writer = csv.writer(results_file)
+    writer.writerow(["puzzle", "bucket", "depth", "algo", "status", "moves", "optimal",
+                     "seconds", "nodes", "peak_bytes"])
+    optimal = 0
+    for name, bucket, depth, state in corpus:
+        for algo in algos:
+            row = [name, bucket, depth, algo]
+            try:
+                path, seconds, nodes, peak = bench_run(state, algo, options, timeout)
+                if algo in BENCH_UNTRACED:
+                    peak = ""
+                elif path is not None:
+                    try:
+                        peak = bench_run(state, algo, options, timeout and timeout * BENCH_TRACE_SLOWDOWN,
+                                         trace=True)[3]
+                    except SearchTimeout:
+                        peak = ""
+            except SearchTimeout:
+                row += ["timeout", "", "", timeout, "", ""]
+            except Exception as e:
+                row += ["error: {}".format(e), "", "", "", "", ""]
+            else:
+                if path is None:
+                    row += ["unsolvable", "", "", round(seconds, 6), nodes, peak]
+                else:
+                    moves = len(path) - 1
+                    optimal += moves == depth
+                    row += ["solved", moves, "yes" if moves == depth else "no",
+                            round(seconds, 6), nodes, peak]
+            writer.writerow(row)
+            results_file.flush()
+    results_file.close()
+    return optimal
+
+
+#====================================================================================
+# Solver service
+#
+# A long running process that reads one JSON request per line and answers
+# each with one JSON line, so variants, heuristics, tables and caches are
+# built once and stay warm. A request holds a "board" in the text format of
+# puzzle files and optionally an "id", echoed back, and any of the keys of
+# REQUEST_OPTIONS, which override the defaults the service was started with.
+# The other SERVE_OPTIONS, the variant and every file the service opens,
+# are only set on the command line.
+# The answer holds "status" (solved, unsolvable, timeout, cancelled,
+# rejected or error), "moves", the "solution" as move lines or as grids,
+# and "stats". A request with "hint" set to true is answered with just the
+# best next move, as "hint", from a HintSession kept per variant and
+# heuristic.
+
+SERVE_OPTIONS = ("algo", "heuristic", "symmetry", "tt_size", "db", "variant", "cache", "cache_size",
+                 "workers", "time_budget", "memory", "spill_dir", "components", "pdb", "format", "timeout")
+
+# the options a request may set; tt_size and timeout may only be lowered
+REQUEST_OPTIONS = ("algo", "heuristic", "symmetry", "tt_size", "time_budget", "format", "timeout")
+
+# seconds a --serve connection may wait between requests before it is closed
+SERVE_IDLE_TIMEOUT = 300
+
+
+def request_options(request, defaults):
+    """
+    The defaults with the REQUEST_OPTIONS a request gives.
+
+    :raises ValueError: If the request sets any other of SERVE_OPTIONS, or
+        raises tt_size or timeout above the default
+    """
+    fixed = [key for key in SERVE_OPTIONS if key in request and key not in REQUEST_OPTIONS]
+    if fixed:
+        raise ValueError("{} can only be set when the service is started".format(", ".join(fixed)))
+    for key in ("tt_size", "timeout"):
+        limit = defaults.get(key)
+        if key in request and limit and not (isinstance(request[key], (int, float)) and 0 < request[key] <= limit):
+            raise ValueError("{} must be above 0 and at most {}".format(key, limit))
+    options = dict(defaults)
+    options.update((key, request[key]) for key in REQUEST_OPTIONS if key in request)
+    return options
+
+
+def serve_request(request, defaults, cancel=None, deadline=None):
+    """
+    Answer one decoded request.
+
+    :param request: The request, as described above.
+    :type request: dict
+    :param defaults: A value for every key of SERVE_OPTIONS.
+    :type defaults: dict
+    :param cancel: Stops the search once it returns True, as SearchStats.cancel.
+    :type cancel: Optional[Callable[[], bool]]
+    :param deadline: The time.time() at which the search is stopped and
+        reported as a timeout; the request's timeout may bring it forward.
+    :type deadline: Optional[float]
+    :rtype: dict
+    """
+    response = {"id": request.get("id")}
+    stats = SearchStats()
+    started = time.perf_counter()
+    try:
+        options = request_options(request, defaults)
+        geometry = open_geometry(options.pop("variant"))
+        with stats.phase("parse"):
+            start = parse_bits(request["board"].splitlines(), geometry)
+        algo = options.pop("algo")
+        format = options.pop("format")
+        timeout = options.pop("timeout")
+        cache_size = options.pop("cache_size")
+        if options["cache"]:
+            options["cache"] = open_cache(options["cache"], cache_size, geometry)
+        # searches poll the deadline, as SIGALRM only reaches the main thread
+        if timeout:
+            deadline = min(deadline or float("inf"), time.time() + timeout)
+        if cancel is not None or deadline is not None:
+            stats.cancel = lambda: (cancel is not None and cancel()) or \
+                (deadline is not None and time.time() >= deadline)
+        with stats.phase("search"):
+            if request.get("hint"):
+                hint = open_hints(geometry, options["heuristic"], options["pdb"]).hint(start, stats)
+                path = None if hint is None else [start]
+            else:
+                path = solve(start, algo, stats=stats, geometry=geometry, **options)
+    except SearchCancelled:
+        response["status"] = "timeout" if deadline is not None and time.time() >= deadline else "cancelled"
+    except Exception as e:
+        response["status"] = "error"
+        response["error"] = "{}: {}".format(type(e).__name__, e)
+    else:
+        if path is None:
+            response["status"] = "unsolvable"
+        elif request.get("hint"):
+            response["status"] = "solved"
+            response["moves"] = hint[1]
+            response["hint"] = move_text(start, hint[0], geometry) if hint[0] is not None else None
+        else:
+            response["status"] = "solved"
+            response["moves"] = len(path) - 1
+            if format == "grids":
+                response["solution"] = [bit_text(state, geometry) for state in path]
+            else:
+                response["solution"] = [move_text(state, child, geometry) for state, child in zip(path, path[1:])]
+    response["stats"] = stats.report()
+    response["stats"]["seconds"] = round(time.perf_counter() - started, 6)
+    return response
+
+
+def serve_lines(instream, outstream, defaults):
+    """
+    Answer every JSON line of instream on outstream until it ends.
+    Blank lines are skipped; a line that is not a JSON object gets an error.
+    """
+    for line in instream:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or "board" not in request:
+                raise ValueError("a request is a JSON object with a board")
+        except ValueError as e:
+            response = {"id": None, "status": "error", "error": str(e)}
+        else:
+            response = serve_request(request, defaults)
+        outstream.write(json.dumps(response) + "\n")
+        outstream.flush()
+
+
+class ServeHandler(socketserver.StreamRequestHandler):
+    """
+    Serves the JSON lines of one connection, which is closed once it has
+    been idle for SERVE_IDLE_TIMEOUT seconds.
+    """
+
+    timeout = SERVE_IDLE_TIMEOUT
+
+    def handle(self):
+        instream = io.TextIOWrapper(self.rfile, encoding="utf-8")
+        outstream = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+        try:
+            serve_lines(instream, outstream, self.server.defaults)
+        except (ConnectionResetError, BrokenPipeError, TimeoutError):
+            # the client went away or stayed quiet; only its connection ends
+            pass
+
+
+def clear_socket(path):
+    """
+    Remove the Unix socket an earlier service left at path, if any.
+
+    :raises FileExistsError: If something other than a socket is at path
+    """
+    try:
+        mode = os.stat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError("{} exists and is not a socket".format(path))
+    os.remove(path)
+
+
+def serve(address, defaults):
+    """
+    Run the service on stdin and stdout ("-"), a TCP port ("host:port") or
+    a Unix socket (any other address, taken as its path). Each connection
+    is served in its own thread, so a slow or idle client does not hold up
+    the others.
+
+    :param defaults: A value for every key of SERVE_OPTIONS.
+    :type defaults: dict
+    """
+    if address == "-":
+        serve_lines(sys.stdin, sys.stdout, defaults)
+        return
+    host, colon, port = address.rpartition(":")
+    if colon and port.isdigit():
+        server = socketserver.ThreadingTCPServer((host or "127.0.0.1", int(port)), ServeHandler)
+    else:
+        clear_socket(address)
+        server = socketserver.ThreadingUnixStreamServer(address, ServeHandler)
+    server.daemon_threads = True
+    server.defaults = defaults
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+#====================================================================================
+# Asyncio front end
+#
+# AsyncSolver answers service requests for asyncio callers. Searches run in
+# a pool of worker processes; each running request owns a slot of a shared
+# flag array that its search polls through SearchStats.cancel, so a request
+# that is cancelled or runs past its deadline stops within a few hundred
+# expansions. Admission control has two lanes: every request first runs for
+# at most ASYNC_PROBE seconds, and only those still unsolved go on to the
+# slow lane, which can hold every worker but one. Easy boards therefore
+# never wait behind a queue of hard ones.
+
+ASYNC_PROBE = 0.05
+
+# the cancel flags of the pool, set in each worker process
+async_flags = None
+
+
+def async_worker_init(flags):
+    global async_flags
+    async_flags = flags
+
+
+def async_work(request, defaults, slot, deadline):
+    """
+    Answer one request in a worker process, stopping when slot is flagged
+    or the deadline passes.
+    """
+    def cancel():
+        return async_flags[slot] != 0
+    return serve_request(request, defaults, cancel, deadline)
+
+
+class AsyncSolver:
+    """
+    Solves service requests in worker processes for asyncio callers.
+    """
+
+    def __init__(self, defaults, workers=None, max_waiting=1000):
+        """
+        :param defaults: A value for every key of SERVE_OPTIONS; its
+            timeout is the deadline of requests that give none.
+        :type defaults: dict
+        :param workers: Worker processes, at least 2 so one is always kept
+            for fast requests; defaults to the number of CPUs.
+        :type workers: Optional[int]
+        :param max_waiting: Requests allowed to wait for a worker before new
+            ones are rejected.
+        :type max_waiting: int
+        :raises ValueError: If workers is less than 2
+        """
+        if workers is not None and workers < 2:
+            raise ValueError("need at least 2 workers, got {}".format(workers))
+        self.limits = dict(defaults)
+        self.defaults = dict(defaults, timeout=None)
+        self.workers = workers or max(2, os.cpu_count() or 1)
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self.flags = multiprocessing.Array('b', self.workers, lock=False)
+        self.free = list(range(self.workers))
+        self.running = asyncio.Semaphore(self.workers)
+        self.slow = asyncio.Semaphore(self.workers - 1)
+        self.pool = ProcessPoolExecutor(self.workers, initializer=async_worker_init, initargs=(self.flags,))
+
+    async def solve(self, request):
+        """
+        Answer one request, as serve_request does. Cancelling the awaiting
+        task stops its search.
+
+        :rtype: dict
+        """
+        request = dict(request)
+        try:
+            timeout = request_options(request, self.limits)["timeout"]
+        except ValueError as e:
+            return {"id": request.get("id"), "status": "error", "error": "ValueError: {}".format(e)}
+        request.pop("timeout", None)
+        deadline = None if not timeout else time.time() + timeout
+        if self.waiting >= self.max_waiting:
+            return {"id": request.get("id"), "status": "rejected", "error": "too many requests waiting"}
+        probe = time.time() + ASYNC_PROBE
+        response = await self.__run(request, probe if deadline is None else min(deadline, probe))
+        if response["status"] != "timeout" or (deadline is not None and time.time() >= deadline):
+            return response
+        if not await self.__acquire(self.slow, deadline):
+            return {"id": request.get("id"), "status": "timeout"}
+        try:
+            return await self.__run(request, deadline)
+        finally:
+            self.slow.release()
+
+    async def __acquire(self, semaphore, deadline):
+        # wait for semaphore until the deadline; False if it passed first
+        self.waiting += 1
+        try:
+            remaining = None if deadline is None else max(0, deadline - time.time())
+            await asyncio.wait_for(semaphore.acquire(), remaining)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    async def __run(self, request, deadline):
+        if not await self.__acquire(self.running, deadline):
+            return {"id": request.get("id"), "status": "timeout"}
+        slot = self.free.pop()
+        self.flags[slot] = 0
+        future = asyncio.get_running_loop().run_in_executor(self.pool, async_work, request, self.defaults,
+                                                            slot, deadline)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # stop the search, and hold its worker until it has stopped
+            self.flags[slot] = 1
+            await asyncio.wait([future])
+            raise
+        finally:
+            self.free.append(slot)
+            self.running.release()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+async def serve_async_connection(solver, reader, writer):
+    """
+    Answer the JSON line requests of one connection concurrently, in the
+    order they finish. When the client closes the connection, its
+    unanswered requests are cancelled.
+    """
+    tasks = set()
+
+    async def answer(request):
+        response = await solver.solve(request)
+        writer.write((json.dumps(response) + "\n").encode())
+
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict) or "board" not in request:
+                    raise ValueError("a request is a JSON object with a board")
+            except ValueError as e:
+                writer.write((json.dumps({"id": None, "status": "error", "error": str(e)}) + "\n").encode())
+                continue
+            task = asyncio.create_task(answer(request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        writer.close()
+
+
+def serve_async(address, defaults, workers=None, max_waiting=1000):
+    """
+    Run an AsyncSolver on a TCP port ("host:port") or a Unix socket (any
+    other address, taken as its path).
+    """
+    async def main():
+        solver = AsyncSolver(defaults, workers, max_waiting)
+
+        def connected(reader, writer):
+            return serve_async_connection(solver, reader, writer)
+
+        host, colon, port = address.rpartition(":")
+        if colon and port.isdigit():
+            server = await asyncio.start_server(connected, host or "127.0.0.1", int(port))
+        else:
+            clear_socket(address)
+            server = await asyncio.start_unix_server(connected, address)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            solver.close()
+
+    asyncio.run(main())
+
+
 if __name__ == "__main__":  
       
   
@@ -567,38 +4305,454 @@ if __name__ == "__main__":
     parser.add_argument(  
         "--inputfile",  
         type=str,  
-        required=True,  
         help="The input file that contains the puzzle."  
     )  
     parser.add_argument(  
         "--outputfile",  
         type=str,  
-        required=True,  
         help="The output file that contains the solution."  
     )  
     parser.add_argument(  
         "--algo",  
         type=str,  
-        required=True,  
-        choices=['astar', 'dfs'],  
-        help="The searching algorithm."  
+        choices=list(ALGORITHMS),  
+        help="The searching algorithm; vbfs needs numpy."  
     )  
+    parser.add_argument(
+        "--engine",
+        type=str,
+        default="grid",
+        choices=['grid', 'bitboard'],
+        help="The state representation used by astar and dfs; other algorithms always use bitboard."
+    )
+    parser.add_argument(
+        "--symmetry",
+        action="store_true",
+        help="Treat left-right mirror images as the same state (astar and dfs, bitboard engine only)."
+    )
+    parser.add_argument(
+        "--heuristic",
+        type=str,
+        default="manhattan",
+        choices=['manhattan', 'pdb'],
+        help="The heuristic used by astar, idastar, hda and anytime; pdb needs the bitboard engine."
+    )
+    parser.add_argument(
+        "--tt-size",
+        type=int,
+        default=1 << 20,
+        help="Slots in the idastar transposition table, which bounds its memory."
+    )
+    parser.add_argument(
+        "--db",
+        type=str,
+        help="The distance database used by --algo db."
+    )
+    parser.add_argument(
+        "--pdb",
+        type=str,
+        help="The pattern file used by --heuristic pdb; built in memory when it is for another piece set."
+    )
+    parser.add_argument(
+        "--build-pdb",
+        type=str,
+        help="Write the pattern databases for the piece set of the input puzzle to this file and exit."
+    )
+    parser.add_argument(
+        "--build-db",
+        type=str,
+        help="Write a distance database for the piece set of the input puzzle to this file and exit."
+    )
+    parser.add_argument(
+        "--build-components",
+        type=str,
+        help="Label every layout of the piece set of --inputfile (the standard set if not given) "
+             "with its component, write the table here and exit."
+    )
+    parser.add_argument(
+        "--components",
+        type=str,
+        help="Component table; unsolvable boards of its piece set are rejected without a search."
+    )
+    parser.add_argument(
+        "--component-report",
+        type=int,
+        metavar="N",
+        help="Describe the --components table with its N largest components and hardest starts, and exit."
+    )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="grids",
+        choices=['grids', 'moves', 'packed'],
+        help="Write every board of the solution, the start board and one line per move, "
+             "or every board as a binary board code."
+    )
+    parser.add_argument(
+        "--replay",
+        type=str,
+        help="Check a solution written with --format moves or packed, write it to --outputfile "
+             "in --format and exit."
+    )
+    parser.add_argument(
+        "--variant",
+        type=str,
+        help="A JSON file describing the board size, piece catalog and goal cells; "
+             "the standard 4x5 board if omitted."
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        help="A solution cache file checked before searching (bitboard engine only)."
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1000000,
+        help="The most boards kept in --cache."
+    )
+    parser.add_argument(
+        "--batch",
+        type=str,
+        help="Solve every puzzle named by a directory, glob pattern or manifest file "
+             "instead of --inputfile (bitboard engine only)."
+    )
+    parser.add_argument(
+        "--puzzles",
+        type=str,
+        help="Solve every puzzle of a file of boards separated by blank lines ('-' for stdin) "
+             "as --batch does."
+    )
+    parser.add_argument(
+        "--outputdir",
+        type=str,
+        help="Where --batch writes one <name>_sol.txt per puzzle."
+    )
+    parser.add_argument(
+        "--summary",
+        type=str,
+        help="The --batch summary CSV; defaults to summary.csv in --outputdir."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes for --batch, --serve-async (at least 2) or --algo hda; "
+             "defaults to the number of CPUs."
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        help="Puzzles queued or running at once in --batch; defaults to twice --workers."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        help="Seconds allowed per --batch puzzle, --bench run or --serve request."
+    )
+    parser.add_argument(
+        "--bench",
+        type=str,
+        help="Run every algorithm (or only --algo) on a generated corpus and write the results CSV here."
+    )
+    parser.add_argument(
+        "--bench-count",
+        type=int,
+        default=5,
+        help="Puzzles drawn per difficulty bucket and piece set for --bench."
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the --bench corpus."
+    )
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        help="Also write the --bench corpus to this directory."
+    )
+    parser.add_argument(
+        "--memory",
+        type=int,
+        default=1 << 20,
+        help="Successors --algo external holds in memory before spilling them to disk."
+    )
+    parser.add_argument(
+        "--spill-dir",
+        type=str,
+        help="Where --algo external keeps its files; the system temporary directory if not given."
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help="Seconds --algo anytime keeps improving its path; it runs to an optimal path if not given."
+    )
+    parser.add_argument(
+        "--enumerate",
+        action="store_true",
+        help="Count every layout reachable from --inputfile with the vbfs engine (needs numpy) and exit."
+    )
+    parser.add_argument(
+        "--serve",
+        type=str,
+        metavar="ADDRESS",
+        help="Answer JSON line requests on stdin and stdout (-), host:port or a Unix socket path."
+    )
+    parser.add_argument(
+        "--serve-async",
+        type=str,
+        metavar="ADDRESS",
+        help="Answer JSON line requests concurrently on host:port or a Unix socket path, "
+             "with deadlines (--timeout) and cancellation."
+    )
+    parser.add_argument(
+        "--max-waiting",
+        type=int,
+        default=1000,
+        help="Requests --serve-async lets wait for a worker before rejecting new ones."
+    )
+    parser.add_argument(
+        "--hint",
+        action="store_true",
+        help="Print the best next move for --inputfile and the moves left, and exit."
+    )
+    parser.add_argument(
+        "--stats",
+        type=str,
+        help="Write search counters and the time of each phase to this JSON file."
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help="Run the search under a sampling profiler and write its JSON report here."
+    )
     args = parser.parse_args()  
+    if args.algo == "db" and args.db is None:
+        parser.error("--algo db needs --db")
+    if args.algo == "vbfs" or args.enumerate:
+        try:
+            import_numpy()
+        except ImportError as e:
+            parser.error(str(e))
+    # --serve answers with astar unless told otherwise; --bench without --algo
+    # picks the algorithms that use these options
+    try:
+        check_options(args.algo or "astar", args.heuristic, args.symmetry)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.serve or args.serve_async:
+        if args.serve_async and args.workers is not None and args.workers < 2:
+            parser.error("--serve-async needs --workers of at least 2, one kept for fast requests")
+        defaults = {"algo": args.algo or "astar", "heuristic": args.heuristic, "symmetry": args.symmetry,
+                    "tt_size": args.tt_size, "db": args.db, "variant": args.variant, "cache": args.cache,
+                    "cache_size": args.cache_size, "workers": args.workers, "time_budget": args.time_budget,
+                    "memory": args.memory, "spill_dir": args.spill_dir, "components": args.components,
+                    "pdb": args.pdb,
+                    "format": "moves", "timeout": args.timeout}
+        try:
+            if args.serve_async:
+                serve_async(args.serve_async, defaults, args.workers, args.max_waiting)
+            else:
+                serve(args.serve, defaults)
+        except FileExistsError as e:
+            parser.error(str(e))
+        sys.exit(0)
+    if args.batch or args.puzzles:
+        if args.outputdir is None or args.algo is None:
+            parser.error("--batch and --puzzles need --outputdir and --algo")
+        if args.algo == "hda":
+            parser.error("--batch already uses every worker; use another --algo")
+        options = {"heuristic": args.heuristic, "symmetry": args.symmetry,
+                   "tt_size": args.tt_size, "db": args.db,
+                   "cache": args.cache, "cache_size": args.cache_size, "variant": args.variant,
+                   "format": args.format, "time_budget": args.time_budget,
+                   "memory": args.memory, "spill_dir": args.spill_dir, "components": args.components,
+                   "pdb": args.pdb}
+        inputs = batch_inputs(args.batch) if args.batch else container_inputs(args.puzzles)
+        summary = args.summary or os.path.join(args.outputdir, "summary.csv")
+        start_time = time.time()
+        solved, attempted = run_batch(inputs, args.outputdir, args.algo, options, summary,
+                                      args.workers, args.max_in_flight, args.timeout)
+        print("solved " + str(solved) + " of " + str(attempted) + " puzzles using "
+              + str(time.time() - start_time) + "s \n")
+        sys.exit(0)
+    geometry = open_geometry(args.variant)
+    if args.inputfile:
+        try:
+            read_from_file(args.inputfile, geometry)
+        except BoardError as e:
+            parser.error("{}: {}".format(args.inputfile, e))
+    if args.bench:
+        if args.inputfile:
+            piece_sets = [bit_counts(board_to_bits(read_from_file(args.inputfile, geometry), geometry), geometry)]
+        elif geometry is STANDARD:
+            piece_sets = BENCH_PIECE_SETS
+        else:
+            parser.error("--bench with --variant needs --inputfile for its piece set")
+        corpus = generate_corpus(piece_sets, args.bench_count, args.seed, geometry)
+        if args.corpus:
+            write_corpus(corpus, args.corpus, geometry)
+        if args.algo:
+            algos = [args.algo]
+        else:
+            # only the algorithms that use the --heuristic and --symmetry given
+            algos = [algo for algo in ALGORITHMS if (algo != "db" or args.db)
+                     and (not args.symmetry or algo in SYMMETRY_ALGORITHMS)
+                     and (args.heuristic == "manhattan" or algo in HEURISTIC_ALGORITHMS)]
+        options = {"heuristic": args.heuristic, "symmetry": args.symmetry,
+                   "tt_size": args.tt_size, "db": args.db, "geometry": geometry,
+                   "workers": args.workers, "time_budget": args.time_budget,
+                   "memory": args.memory, "spill_dir": args.spill_dir, "components": args.components,
+                   "pdb": args.pdb}
+        start_time = time.time()
+        optimal = run_bench(corpus, algos, options, args.bench, args.timeout)
+        print(str(optimal) + " of " + str(len(corpus) * len(algos)) + " runs optimal using "
+              + str(time.time() - start_time) + "s \n")
+        sys.exit(0)
+    if args.build_components:
+        if args.inputfile:
+            counts = bit_counts(board_to_bits(read_from_file(args.inputfile, geometry), geometry), geometry)
+        else:
+            counts = BENCH_PIECE_SETS[-1]
+        layouts, components = build_components(counts, args.build_components, geometry)
+        print(str(layouts) + " layouts in " + str(components) + " components written to "
+              + args.build_components)
+        sys.exit(0)
+    if args.component_report is not None:
+        if args.components is None:
+            parser.error("--component-report needs --components")
+        try:
+            table = open_components(args.components, geometry)
+        except ValueError as e:
+            parser.error(str(e))
+        print(component_report(table, args.component_report, geometry))
+        sys.exit(0)
+    if args.replay:
+        if args.outputfile is None:
+            parser.error("--replay needs --outputfile")
+        replay_file = open(args.replay, "rb")
+        packed = replay_file.read(len(PACKED_MAGIC)) == PACKED_MAGIC
+        replay_file.close()
+        path = replay_packed(args.replay, geometry) if packed else replay_moves(args.replay, geometry)
+        try:
+            write_path(args.outputfile, path, geometry, args.format)
+        except ValueError as e:
+            parser.error("{}: {}".format(args.replay, e))
+        sys.exit(0)
+    if args.inputfile is None:
+        parser.error("--inputfile is required unless --batch or --replay is given")
+    if args.enumerate:
+        stats = SearchStats()
+        levels = vector_levels(board_to_bits(read_from_file(args.inputfile, geometry), geometry),
+                               geometry, stats)
+        print(str(stats.visited) + " layouts reachable, the farthest " + str(len(levels) - 1)
+              + " moves away")
+        sys.exit(0)
+    if args.hint:
+        start = board_to_bits(read_from_file(args.inputfile, geometry), geometry)
+        hint = open_hints(geometry, args.heuristic, args.pdb).hint(start)
+        if hint is None:
+            print("not found: no goal can be reached from this board")
+        elif hint[0] is None:
+            print("already solved")
+        else:
+            print(move_text(start, hint[0], geometry) + " (" + str(hint[1]) + " moves left)")
+        sys.exit(0)
+    if args.build_pdb:
+        counts = bit_counts(board_to_bits(read_from_file(args.inputfile, geometry), geometry), geometry)
+        layouts = PatternDatabase(counts, geometry).save(args.build_pdb, geometry)
+        print(str(layouts) + " layouts written to " + args.build_pdb)
+        sys.exit(0)
+    if args.build_db:
+        counts = bit_counts(board_to_bits(read_from_file(args.inputfile, geometry), geometry), geometry)
+        print(str(build_db(counts, args.build_db, geometry)) + " layouts written to " + args.build_db)
+        sys.exit(0)
+    if args.outputfile is None or args.algo is None:
+        parser.error("--outputfile and --algo are required unless --build-db or --build-pdb is given")
+    if args.heuristic == "pdb" and args.engine == "grid" and args.algo == "astar":
+        parser.error("--heuristic pdb needs --engine bitboard")
+    if args.symmetry and args.engine == "grid" and args.algo in ("astar", "dfs"):
+        parser.error("--symmetry needs --engine bitboard")
+    if args.cache and args.engine == "grid" and args.algo in ("astar", "dfs"):
+        parser.error("--cache needs --engine bitboard")
     print(args.inputfile)  
     print("\n")
     print(args.outputfile) 
     print("\n") 
     print(args.algo)
     print("\n")  
-    board = read_from_file(args.inputfile)
+    stats = SearchStats()
+    with stats.phase("parse"):
+        board = read_from_file(args.inputfile, geometry)
     board.display()  
     state0 = State(board, manhattan(board), 0)
     print("\n")  
+    profiler = SamplingProfiler() if args.profile else None
+    if profiler is not None:
+        profiler.__enter__()
     start_time = time.time()
-    if args.algo == "dfs":
-        dfs(state0, args.outputfile)
-    elif args.algo == "astar":
-        astar(state0, args.outputfile)
+    moves = None
+    if args.components:
+        with stats.phase("search"):
+            try:
+                solvable = open_components(args.components, geometry).solvable(board_to_bits(board, geometry),
+                                                                               geometry)
+            except ValueError as e:
+                parser.error(str(e))
+    if args.components and not solvable:
+        print("not found: no goal can be reached from this board")
+    elif args.engine == "grid" and args.algo in ("dfs", "astar"):
+        search_function = dfs if args.algo == "dfs" else astar
+        found = search_function(state0, args.outputfile, args.format, stats)
+        if found is None:
+            print("not found")
+        moves = found.depth if found else None
+    else:
+        try:
+            cache = open_cache(args.cache, args.cache_size, geometry) if args.cache else None
+        except ValueError as e:
+            parser.error(str(e))
+
+        def improved(path, bound):
+            # keep the best path so far on disk in case the budget runs out
+            write_path(args.outputfile, path, geometry, args.format)
+            print(str(len(path) - 1) + " moves, at most " + str(bound) + " times optimal, after "
+                  + str(time.time() - start_time) + "s")
+
+        try:
+            with stats.phase("search"):
+                path = solve(board_to_bits(board, geometry), args.algo, args.heuristic, args.symmetry,
+                             args.tt_size, args.db, stats, geometry, cache, args.workers,
+                             args.time_budget, improved, args.memory, args.spill_dir, pdb=args.pdb)
+        except ValueError as e:
+            # a database, pattern file or variant that does not fit the board
+            parser.error(str(e))
+        if cache is not None:
+            print("cache hits: " + str(cache.hits) + ", misses: " + str(cache.misses)
+                  + ", boards: " + str(len(cache)))
+        if path is None:
+            print("not found")
+        else:
+            print("found")
+            if stats.bound is not None:
+                print("at most " + str(stats.bound) + " times optimal")
+            moves = len(path) - 1
+            with stats.phase("write"):
+                write_path(args.outputfile, path, geometry, args.format)
+            print(str(moves) + " moves using " + str(time.time() - start_time) + "s \n")
+    if profiler is not None:
+        profiler.__exit__(None, None, None)
+        profile_file = open(args.profile, "w")
+        json.dump(profiler.report(), profile_file, indent=2)
+        profile_file.close()
+    if args.stats:
+        report = {"puzzle": args.inputfile, "algo": args.algo,
+                  "engine": "grid" if args.engine == "grid" and args.algo in ("astar", "dfs") else "bitboard",
+                  "moves": moves}
+        report.update(stats.report())
+        stats_file = open(args.stats, "w")
+        json.dump(report, stats_file, indent=2)
+        stats_file.close()
       
       
       
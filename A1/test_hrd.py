@@ -0,0 +1,405 @@
+import io
+import json
+import os
+import random
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import hrd
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# the optimal number of moves of each sample board
+SAMPLES = {"testhrd_easy1.txt": 1, "testhrd_med1.txt": 53, "testhrd_hard1.txt": 116}
+
+# every algorithm that finds a shortest path; idastar takes too long on hard1
+OPTIMAL_RUNS = [(algo, name) for algo in hrd.ALGORITHMS if algo not in ("dfs", "db")
+                for name in SAMPLES if (algo, name) != ("idastar", "testhrd_hard1.txt")]
+
+# a 3x4 board with five kinds of piece: the goal square, the standard
+# vertical, horizontal and single pieces, and an L
+VARIANT = hrd.Geometry(3, 4, [(1, 3)], [("1",), ("^", "v"), ("<>",), ("2",), ("L ", "LL")])
+VARIANT_COUNTS = [1, 1, 1, 2, 1]
+
+
+def puzzle(name, geometry=hrd.STANDARD):
+    return hrd.board_to_bits(hrd.read_from_file(os.path.join(HERE, name), geometry), geometry)
+
+
+def variant_start():
+    # the layout farthest from a goal, so every test has a real search
+    distance, depth = hrd.goal_distances(VARIANT_COUNTS, VARIANT)
+    return max(distance, key=distance.get), depth
+
+
+def check_path(path, start, geometry=hrd.STANDARD):
+    assert path[0] == start
+    assert hrd.bit_is_goal(path[-1], geometry)
+    for state, child in zip(path, path[1:]):
+        assert child in hrd.bit_successors(state, geometry)
+
+
+def serve_defaults(**options):
+    defaults = dict.fromkeys(hrd.SERVE_OPTIONS)
+    defaults.update(algo="astar", heuristic="manhattan", symmetry=False, tt_size=1 << 20,
+                    cache_size=1000, memory=1 << 20, format="moves")
+    defaults.update(options)
+    return defaults
+
+
+def wait_for_socket(path, process=None):
+    deadline = time.time() + 30
+    while not os.path.exists(path):
+        assert time.time() < deadline, "the service did not start"
+        assert process is None or process.poll() is None, "the service exited"
+        time.sleep(0.05)
+
+
+def ask(path, lines):
+    # send request lines on one connection and read one answer per line
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.settimeout(60)
+    connection.connect(path)
+    stream = connection.makefile("rw")
+    for line in lines:
+        stream.write(line + "\n")
+    stream.flush()
+    responses = [json.loads(stream.readline()) for line in lines]
+    connection.close()
+    return responses
+
+
+#====================================================================================
+# Searches
+
+
+@pytest.mark.parametrize("algo, name", OPTIMAL_RUNS)
+def test_optimal_algorithms_find_shortest_paths(algo, name):
+    if algo == "vbfs":
+        pytest.importorskip("numpy")
+    start = puzzle(name)
+    path = hrd.solve(start, algo, workers=2)
+    check_path(path, start)
+    assert len(path) - 1 == SAMPLES[name]
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_dfs_finds_a_legal_path(name):
+    start = puzzle(name)
+    check_path(hrd.solve(start, "dfs"), start)
+
+
+@pytest.mark.parametrize("name", SAMPLES)
+def test_grid_astar_finds_shortest_paths(name, tmp_path):
+    board = hrd.read_from_file(os.path.join(HERE, name))
+    found = hrd.astar(hrd.State(board, hrd.manhattan(board), 0), str(tmp_path / "sol.txt"))
+    assert found.depth == SAMPLES[name]
+
+
+@pytest.mark.parametrize("algo", hrd.HEURISTIC_ALGORITHMS)
+def test_pattern_heuristic_keeps_paths_shortest(algo):
+    start = puzzle("testhrd_med1.txt")
+    path = hrd.solve(start, algo, heuristic="pdb", workers=2)
+    check_path(path, start)
+    assert len(path) - 1 == SAMPLES["testhrd_med1.txt"]
+
+
+def test_searches_on_variant():
+    start, depth = variant_start()
+    for algo in ("astar", "bibfs", "idastar", "external"):
+        path = hrd.solve(start, algo, geometry=VARIANT)
+        check_path(path, start, VARIANT)
+        assert len(path) - 1 == depth
+
+
+def test_ignored_options_are_rejected():
+    with pytest.raises(ValueError, match="symmetry"):
+        hrd.solve(puzzle("testhrd_easy1.txt"), "bibfs", symmetry=True)
+    with pytest.raises(ValueError, match="heuristic"):
+        hrd.solve(puzzle("testhrd_easy1.txt"), "bibfs", heuristic="pdb")
+
+
+def test_small_transposition_table_stays_optimal():
+    start = puzzle("testhrd_med1.txt")
+    path = hrd.solve(start, "idastar", tt_size=4096)
+    check_path(path, start)
+    assert len(path) - 1 == SAMPLES["testhrd_med1.txt"]
+
+
+#====================================================================================
+# Tables and caches
+
+
+def test_distance_database_round_trip(tmp_path):
+    filename = str(tmp_path / "med1.db")
+    start = puzzle("testhrd_med1.txt")
+    hrd.build_db(hrd.bit_counts(start), filename)
+    path = hrd.solve(start, "db", db=filename)
+    check_path(path, start)
+    assert len(path) - 1 == SAMPLES["testhrd_med1.txt"]
+    with pytest.raises(ValueError, match="different piece set"):
+        hrd.solve(puzzle("testhrd_hard1.txt"), "db", db=filename)
+
+
+def test_distance_database_round_trip_on_variant(tmp_path):
+    filename = str(tmp_path / "variant.db")
+    written = hrd.build_db(VARIANT_COUNTS, filename, VARIANT)
+    distance, depth = hrd.goal_distances(VARIANT_COUNTS, VARIANT)
+    assert written == len(distance)
+    table = hrd.DistanceTable(filename, VARIANT)
+    try:
+        assert table.counts == VARIANT_COUNTS
+        for state, d in distance.items():
+            assert table.distance(state, VARIANT) == d
+        start, depth = variant_start()
+        assert len(hrd.db_solve(start, table, VARIANT)) - 1 == depth
+    finally:
+        table.close()
+    with pytest.raises(ValueError, match="3x4 board with 5 kinds"):
+        hrd.DistanceTable(filename)
+
+
+def test_pattern_file_round_trip(tmp_path):
+    filename = str(tmp_path / "hard1.pdb")
+    start = puzzle("testhrd_hard1.txt")
+    patterns = hrd.PatternDatabase(hrd.bit_counts(start))
+    patterns.save(filename)
+    table = hrd.PatternTable(filename)
+    try:
+        distance, depth = hrd.goal_distances(hrd.bit_counts(start))
+        for state in random.Random(0).sample(sorted(distance), 2000):
+            assert table(state) == patterns(state) <= distance[state]
+    finally:
+        table.close()
+    path = hrd.solve(start, "astar", heuristic="pdb", pdb=filename)
+    assert len(path) - 1 == SAMPLES["testhrd_hard1.txt"]
+
+
+def test_pattern_file_round_trip_on_variant(tmp_path):
+    filename = str(tmp_path / "variant.pdb")
+    patterns = hrd.PatternDatabase(VARIANT_COUNTS, VARIANT)
+    patterns.save(filename, VARIANT)
+    table = hrd.PatternTable(filename, VARIANT)
+    try:
+        assert table.counts == VARIANT_COUNTS
+        distance, depth = hrd.goal_distances(VARIANT_COUNTS, VARIANT)
+        for state, d in distance.items():
+            assert table(state, VARIANT) == patterns(state, VARIANT) <= d
+    finally:
+        table.close()
+    with pytest.raises(ValueError, match="3x4 board with 5 kinds"):
+        hrd.PatternTable(filename)
+
+
+def test_component_table_round_trip_on_variant(tmp_path):
+    filename = str(tmp_path / "variant.comp")
+    layouts, components = hrd.build_components(VARIANT_COUNTS, filename, VARIANT)
+    table = hrd.ComponentTable(filename, VARIANT)
+    try:
+        assert table.counts == VARIANT_COUNTS
+        assert (table.size, table.components) == (layouts, components)
+        start, depth = variant_start()
+        assert table.solvable(start, VARIANT)
+        assert table.hardest(table.component(start, VARIANT), VARIANT)[1] == depth
+    finally:
+        table.close()
+    with pytest.raises(ValueError, match="3x4 board with 5 kinds"):
+        hrd.ComponentTable(filename)
+
+
+def test_tables_reject_other_files(tmp_path):
+    filename = str(tmp_path / "med1.comp")
+    hrd.build_components(hrd.bit_counts(puzzle("testhrd_med1.txt")), filename)
+    with pytest.raises(ValueError, match="not a distance database"):
+        hrd.DistanceTable(filename)
+
+
+def test_solution_cache_round_trip(tmp_path):
+    filename = str(tmp_path / "cache.sqlite")
+    start = puzzle("testhrd_med1.txt")
+    cache = hrd.SolutionCache(filename)
+    assert cache.lookup(start) is None
+    path = hrd.bit_astar(start)
+    cache.store(path)
+    cache.close()
+    cache = hrd.SolutionCache(filename)
+    try:
+        assert cache.lookup(start) == path
+        assert cache.lookup(path[10]) == path[10:]
+        mirrored = hrd.STANDARD.mirror(start)
+        check_path(cache.lookup(mirrored), mirrored)
+        assert len(cache) == len(path)
+    finally:
+        cache.close()
+
+
+def test_solution_cache_round_trip_on_variant(tmp_path):
+    filename = str(tmp_path / "cache.sqlite")
+    start, depth = variant_start()
+    cache = hrd.SolutionCache(filename, geometry=VARIANT)
+    cache.store(hrd.bit_astar(start, VARIANT))
+    cache.close()
+    cache = hrd.SolutionCache(filename, geometry=VARIANT)
+    try:
+        path = cache.lookup(start)
+        check_path(path, start, VARIANT)
+        assert len(path) - 1 == depth
+    finally:
+        cache.close()
+    with pytest.raises(ValueError, match="another board"):
+        hrd.SolutionCache(filename)
+
+
+def test_solution_cache_leaves_other_files_alone(tmp_path):
+    filename = str(tmp_path / "other.sqlite")
+    connection = sqlite3.connect(filename)
+    connection.execute("CREATE TABLE boards (x)")
+    connection.execute("INSERT INTO boards VALUES (1)")
+    connection.commit()
+    connection.close()
+    with pytest.raises(ValueError, match="not a solution cache"):
+        hrd.SolutionCache(filename)
+    connection = sqlite3.connect(filename)
+    assert connection.execute("SELECT x FROM boards").fetchall() == [(1,)]
+    connection.close()
+
+
+#====================================================================================
+# Board codes and solution files
+
+
+@pytest.mark.parametrize("geometry, counts", [(hrd.STANDARD, [1, 4, 1, 4]), (VARIANT, VARIANT_COUNTS)])
+def test_board_codes_round_trip(geometry, counts):
+    layouts = list(hrd.bit_layouts(counts, geometry))
+    layouts = random.Random(0).sample(layouts, min(len(layouts), 2000))
+    codes = [hrd.encode_board(state, geometry) for state in layouts]
+    assert [hrd.decode_board(code, geometry) for code in codes] == layouts
+    assert len(set(codes)) == len(layouts)
+    assert max(codes).bit_length() <= 8 * hrd.code_width(geometry)
+    assert hrd.decode_boards(hrd.encode_boards(layouts, geometry), geometry) == layouts
+
+
+def test_packed_solution_round_trip(tmp_path):
+    filename = str(tmp_path / "sol.hrdp")
+    path = hrd.bit_astar(puzzle("testhrd_hard1.txt"))
+    hrd.write_path(filename, path, format="packed")
+    assert list(hrd.replay_packed(filename)) == path
+
+
+def test_replay_rejects_a_glyph_that_is_not_the_moved_piece(tmp_path):
+    path = hrd.bit_astar(puzzle("testhrd_med1.txt"))
+    filename = str(tmp_path / "moves.txt")
+    hrd.write_path(filename, path, format="moves")
+    assert list(hrd.replay_moves(filename)) == path
+    lines = open(filename).read().split("\n")
+    move = hrd.STANDARD.height + 1
+    glyph, x, y, direction = lines[move].split()
+    lines[move] = " ".join(("2" if glyph != "2" else "^", x, y, direction))
+    open(filename, "w").write("\n".join(lines))
+    with pytest.raises(ValueError, match="line {}: the piece anchored at".format(move + 1)):
+        list(hrd.replay_moves(filename))
+
+
+def test_replay_command(tmp_path):
+    path = hrd.bit_astar(puzzle("testhrd_med1.txt"))
+    moves = str(tmp_path / "moves.txt")
+    grids = str(tmp_path / "grids.txt")
+    expected = str(tmp_path / "expected.txt")
+    hrd.write_path(moves, path, format="moves")
+    hrd.write_path(expected, path)
+    command = [sys.executable, hrd.__file__, "--replay", moves, "--outputfile", grids]
+    subprocess.run(command, check=True, capture_output=True)
+    assert open(grids).read() == open(expected).read()
+
+    # make the first move start from a blank cell
+    lines = open(moves).read().split("\n")
+    blank = lines[:hrd.STANDARD.height].index(next(row for row in lines if "." in row))
+    move = hrd.STANDARD.height + 1
+    lines[move] = "2 {} {} up".format(lines[blank].index("."), blank)
+    open(moves, "w").write("\n".join(lines))
+    result = subprocess.run(command, capture_output=True, text=True)
+    assert result.returncode == 2
+    assert "line {}: no piece is anchored at".format(move + 1) in result.stderr
+
+
+#====================================================================================
+# Services
+
+
+def test_serve_lines_answers_and_rejects():
+    board = open(os.path.join(HERE, "testhrd_med1.txt")).read()
+    requests = [{"id": 1, "board": board},
+                {"id": 2, "board": board, "algo": "bibfs", "format": "grids"},
+                {"id": 3, "board": board, "hint": True},
+                {"id": 4, "board": board, "cache": "elsewhere.sqlite"},
+                {"id": 5, "board": board, "variant": "other.json"},
+                {"id": 6, "board": board, "tt_size": 1 << 30},
+                {"id": 7, "board": board, "timeout": 100},
+                {"id": 8, "board": "not a board"}]
+    instream = io.StringIO("".join(json.dumps(request) + "\n" for request in requests) + "[1]\n")
+    outstream = io.StringIO()
+    hrd.serve_lines(instream, outstream, serve_defaults(timeout=30))
+    responses = [json.loads(line) for line in outstream.getvalue().splitlines()]
+    assert [response["id"] for response in responses] == [1, 2, 3, 4, 5, 6, 7, 8, None]
+    assert responses[0]["status"] == "solved" and responses[0]["moves"] == 53
+    assert len(responses[0]["solution"]) == 53
+    assert responses[1]["moves"] == 53 and len(responses[1]["solution"]) == 54
+    assert responses[2]["moves"] == 53 and responses[2]["hint"]
+    assert "only be set when the service is started" in responses[3]["error"]
+    assert "only be set when the service is started" in responses[4]["error"]
+    assert "tt_size" in responses[5]["error"]
+    assert "timeout" in responses[6]["error"]
+    assert [response["status"] for response in responses[3:]] == ["error"] * 6
+
+
+def test_serve_times_out_requests():
+    board = open(os.path.join(HERE, "testhrd_hard1.txt")).read()
+    request = {"id": 1, "board": board, "algo": "idastar", "tt_size": 1024, "timeout": 0.5}
+    started = time.time()
+    response = hrd.serve_request(request, serve_defaults())
+    assert response["status"] == "timeout"
+    assert time.time() - started < 5
+
+
+def test_serve_connections_do_not_wait_for_each_other(tmp_path):
+    address = str(tmp_path / "serve.sock")
+    threading.Thread(target=hrd.serve, args=(address, serve_defaults()), daemon=True).start()
+    wait_for_socket(address)
+    idle = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    idle.connect(address)
+    board = open(os.path.join(HERE, "testhrd_med1.txt")).read()
+    responses = ask(address, [json.dumps({"id": 1, "board": board}),
+                              json.dumps({"id": 2, "board": board, "db": "other.db"})])
+    idle.close()
+    assert responses[0]["status"] == "solved" and responses[0]["moves"] == 53
+    assert responses[1]["status"] == "error"
+
+
+def test_serve_async_protocol(tmp_path):
+    address = str(tmp_path / "async.sock")
+    service = subprocess.Popen([sys.executable, hrd.__file__, "--serve-async", address, "--workers", "2",
+                                "--timeout", "60"], stderr=subprocess.PIPE)
+    try:
+        wait_for_socket(address, service)
+        board = open(os.path.join(HERE, "testhrd_med1.txt")).read()
+        responses = ask(address, [json.dumps({"id": 1, "board": board}),
+                                  json.dumps({"id": 2, "board": board, "spill_dir": "/"}),
+                                  json.dumps({"id": 3, "board": board, "timeout": 120}),
+                                  "not json"])
+    finally:
+        # an interrupted service shuts its worker pool down
+        service.send_signal(signal.SIGINT)
+        service.wait(30)
+    responses = {response["id"]: response for response in responses}
+    assert responses[1]["status"] == "solved" and responses[1]["moves"] == 53
+    assert "only be set when the service is started" in responses[2]["error"]
+    assert "timeout" in responses[3]["error"]
+    assert responses[None]["status"] == "error"